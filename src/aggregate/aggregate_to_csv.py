@@ -7,6 +7,7 @@ from datetime import date
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from src.utils.db_utils import connect_to_db
 from src.utils.log_utils import log_start, log_end
+from src.utils.metrics import RunMetrics
 
 TODAY_STR = date.today().strftime("%Y%m%d")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -29,6 +30,7 @@ def run_aggregate_and_dom():
     run_id_agg, conn_control = log_start(job_name)
     print(f"Job Aggregate_DOM started with Run ID: {run_id_agg}")
     if not run_id_agg: return
+    metrics = RunMetrics(run_id_agg, job_name)
 
     try:
         conn_dwh = connect_to_db("news_warehouse_db")
@@ -36,9 +38,13 @@ def run_aggregate_and_dom():
         
         print("1. Gọi SP_Run_Aggregation để tính toán...")
         cursor_dwh = conn_dwh.cursor()
-        cursor_dwh.callproc('SP_Run_Aggregation')
-        conn_dwh.commit()
-        records_aggregated = 1000 # Giả định số dòng
+        with metrics.stage("sp_run_aggregation") as st:
+            cursor_dwh.callproc('SP_Run_Aggregation')
+            conn_dwh.commit()
+            # Số dòng thực tế của bảng tổng hợp
+            cursor_dwh.execute("SELECT COUNT(*) FROM Agg_Temp_Mart")
+            records_aggregated = cursor_dwh.fetchone()[0]
+            st.rows = records_aggregated
         
         # 2. DOM MULTI-TABLES (Đọc và Ghi 4 bảng)
         print("2. Đang DOM 4 bảng (Aggregate + Dims) ra file CSV...")
@@ -56,8 +62,11 @@ def run_aggregate_and_dom():
                 select_cols = "*" 
 
             sql_query = f"SELECT {select_cols} FROM {table_name}"
-            df = pd.read_sql(sql_query, conn_dwh)
-            df.to_csv(file_path, index=False, encoding='utf8')
+            with metrics.stage(f"dump_{table_name}") as st:
+                df = pd.read_sql(sql_query, conn_dwh)
+                df.to_csv(file_path, index=False, encoding='utf8')
+                st.rows = len(df)
+                st.bytes_written = os.path.getsize(file_path)
             total_files_written += 1
             print(f"   -> Đã ghi {table_name} ({len(df)} dòng)")
         
@@ -72,6 +81,7 @@ def run_aggregate_and_dom():
         print(f"FAIL: {error_msg}. Dừng quy trình.")
         
     finally:
+        metrics.save()
         if conn_dwh: conn_dwh.close()
 
 if __name__ == "__main__":
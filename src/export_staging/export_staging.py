@@ -7,6 +7,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.db_utils import connect_to_db
 from utils.log_utils import log_start, log_end
+from utils.metrics import RunMetrics
 
 def export():
     JOB_NAME = 'export_staging_file'
@@ -25,6 +26,7 @@ def export():
         print("Không khởi tạo được Run ID.")
         return
 
+    metrics = RunMetrics(run_id, JOB_NAME)
     conn = connect_to_db("news_staging_db")
     if not conn: 
         log_end(run_id, "FAILED", 0, 0, "Connection Failed")
@@ -34,8 +36,10 @@ def export():
         print(f"[RunID: {run_id}] Đang xuất dữ liệu ra file CSV...")
         
         # 2. Lấy dữ liệu
-        df = pd.read_sql("SELECT * FROM staging_delta", conn)
-        row_count = len(df)
+        with metrics.stage("read_staging_delta") as st:
+            df = pd.read_sql("SELECT * FROM staging_delta", conn)
+            row_count = len(df)
+            st.rows = row_count
         
         # 3. Kiểm tra và tạo thư mục 
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -46,7 +50,10 @@ def export():
         output_file = f"{output_dir}/delta_data.csv"
         
         # 4. Xuất file
-        df.to_csv(output_file, index=False, header=False)
+        with metrics.stage("write_csv") as st:
+            df.to_csv(output_file, index=False, header=False)
+            st.rows = row_count
+            st.bytes_written = os.path.getsize(output_file)
         print(f"Đã xuất {row_count} dòng ra file: {output_file}")
         
         # 5. GHI LOG THÀNH CÔNG
@@ -60,6 +67,7 @@ def export():
         log_end(run_id, "FAILED", 0, 0, err_msg)
         
     finally:
+        metrics.save()
         if conn: conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import PeakRssSampler
+from extract.page_archive import PageArchive, ReplayServer
+
+# =============================================
+# BENCHMARK CRAWLER (OFFLINE)
+# Mục đích: Chạy run_all_crawl trên kho trang đã ghi (không cần mạng, không cần DB)
+# Ghi kho: CRAWL_RECORD_ARCHIVE=source/bench/pages.db python src/extract/web_scraper.py
+# =============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawler offline trên kho trang đã ghi")
+    parser.add_argument("--archive", default=os.path.join("source", "bench", "pages.db"))
+    parser.add_argument("--keep-output", action="store_true", help="Giữ lại file CSV kết quả")
+    args = parser.parse_args()
+
+    # 1: Mở kho trang + danh sách job đã lưu lúc ghi
+    if not os.path.exists(args.archive):
+        print(f"Không tìm thấy kho trang {args.archive}")
+        return
+    archive = PageArchive(args.archive)
+    jobs = archive.load_jobs()
+    archived = archive.summary()
+    if not jobs or not archived['pages']:
+        print(f"Kho {args.archive} chưa có job hoặc trang nào.")
+        return
+    print(f"Kho: {archived['pages']} trang | {len(jobs)} job")
+
+    # 2: Bật replay server, cấu hình crawler tải từ server local
+    #    (phải đặt biến môi trường trước khi import web_scraper)
+    server = ReplayServer(archive).start()
+    os.environ["CRAWL_REPLAY_URL"] = server.base_url
+    os.environ["CRAWL_SKIP_SEEN"] = "0"
+    os.environ.pop("CRAWL_RECORD_ARCHIVE", None)
+    for key in ("CRAWL_RATE_INITIAL", "CRAWL_RATE_MAX"):
+        os.environ.setdefault(key, "1000")
+    from extract.web_scraper import run_all_crawl
+
+    # 3: Chạy crawler, đo thời gian và RSS
+    output_dir = tempfile.mkdtemp(prefix="bench_crawl_")
+    sampler = PeakRssSampler().start()
+    start = time.perf_counter()
+    try:
+        stats = run_all_crawl(jobs=jobs, output_dir=output_dir)
+    finally:
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        server.stop()
+        archive.close()
+        if not args.keep_output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    # 4: Báo cáo
+    if not stats:
+        return
+    parsed = stats['parsed_pages']
+    print("=" * 50)
+    print(f"  Bài viết      : {stats['pages']} (parse được {parsed}, {stats['rows']} dòng CSV)")
+    print(f"  Thời gian     : {elapsed:.1f}s")
+    print(f"  Tốc độ        : {stats['pages'] / elapsed if elapsed else 0:.1f} trang/giây")
+    print(f"  Parse         : {stats['parse_seconds'] / parsed * 1000 if parsed else 0:.2f} ms/trang")
+    print(f"  RSS cao nhất  : {sampler.peak_bytes / 1024 / 1024:.0f} MB")
+    if args.keep_output:
+        print(f"  Kết quả       : {output_dir}")
+
+if __name__ == "__main__":
+    main()
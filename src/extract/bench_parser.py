@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import glob
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extract.web_scraper import SELECTOR_LOOKUP
+from extract.html_parser import extract_fields_bs4, extract_fields_lxml
+
+# =============================================
+# BENCHMARK PARSER
+# Mục đích: So sánh tốc độ (trang/giây) và kết quả giữa backend bs4 và lxml
+# Corpus: <corpus>/<TenNguon>/*.html (vd: source/bench/pages/VnExpress/abc.html)
+# =============================================
+
+def load_corpus(corpus_dir):
+    pages = []
+    for source_name in sorted(os.listdir(corpus_dir)):
+        if source_name not in SELECTOR_LOOKUP:
+            continue
+        for path in sorted(glob.glob(os.path.join(corpus_dir, source_name, "*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append((source_name, path, f.read()))
+    return pages
+
+def run_backend(pages, backend, repeat):
+    results = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = []
+        for source_name, _, html in pages:
+            cfg = SELECTOR_LOOKUP[source_name]
+            if backend == 'lxml':
+                results.append(extract_fields_lxml(html, source_name, cfg))
+            else:
+                results.append(extract_fields_bs4(html, cfg))
+    elapsed = time.perf_counter() - start
+    return results, (len(pages) * repeat) / elapsed if elapsed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend parse HTML của crawler")
+    parser.add_argument("--corpus", default=os.path.join("source", "bench", "pages"))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # 1: Nạp corpus
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"Không tìm thấy trang HTML nào trong {args.corpus}")
+        return
+    print(f"Corpus: {len(pages)} trang | Lặp: {args.repeat} lần")
+
+    # 2: Chạy 2 backend
+    old_results, old_rate = run_backend(pages, 'bs4', args.repeat)
+    new_results, new_rate = run_backend(pages, 'lxml', args.repeat)
+    print(f"  bs4 (html.parser): {old_rate:8.1f} trang/giây")
+    print(f"  lxml (compiled)  : {new_rate:8.1f} trang/giây  (x{new_rate / old_rate:.1f})")
+
+    # 3: So sánh kết quả từng trường (phải giống hệt nhau)
+    mismatched_pages = 0
+    for (source_name, path, _), old, new in zip(pages, old_results, new_results):
+        diff_fields = [field for field in old if old[field] != new[field]]
+        if diff_fields:
+            mismatched_pages += 1
+            print(f"  [KHÁC] {path}: {', '.join(diff_fields)}")
+            for field in diff_fields:
+                print(f"      {field}: bs4={str(old[field])[:80]!r} | lxml={str(new[field])[:80]!r}")
+    print(f"Kết quả: {len(pages) - mismatched_pages}/{len(pages)} trang khớp từng byte.")
+    if mismatched_pages:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import json
+import glob
+import threading
+from datetime import datetime
+
+from extract.url_utils import canonicalize_url
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CHECKPOINT_DIR = os.path.join(BASE_DIR, "source", "checkpoint")
+
+
+def job_key(job):
+    """Khóa ổn định của một job giữa các lần chạy."""
+    return f"{job['config_id']}|{job['start_url']}"
+
+
+# =============================================
+# CRAWL CHECKPOINT
+# Mục đích: Ghi lại job đã xong và URL đã lưu theo run_id để chạy tiếp khi crawler chết
+# =============================================
+class CrawlCheckpoint:
+    """
+    File JSON Lines chỉ ghi nối: source/checkpoint/crawl_<run_id>.jsonl
+    Mỗi dòng là một sự kiện: start / urls / job_done / finished.
+    URL chỉ được ghi nhận sau khi dòng dữ liệu của nó đã flush (fsync) xuống file CSV.
+    """
+
+    def __init__(self, run_id, csv_prefix=None, checkpoint_dir=DEFAULT_CHECKPOINT_DIR):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.run_id = run_id
+        self.csv_prefix = csv_prefix
+        self.path = os.path.join(checkpoint_dir, f"crawl_{run_id}.jsonl")
+        self.done_jobs = set()
+        self.processed_urls = set()
+        self.finished = False
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.path):
+            self._replay()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self.csv_prefix and not os.path.getsize(self.path):
+            self._append({"event": "start", "run_id": run_id, "csv_prefix": csv_prefix})
+
+    @classmethod
+    def latest_unfinished(cls, checkpoint_dir=DEFAULT_CHECKPOINT_DIR):
+        """Tìm checkpoint gần nhất chưa hoàn tất. Trả về None nếu không có."""
+        files = glob.glob(os.path.join(checkpoint_dir, "crawl_*.jsonl"))
+        for path in sorted(files, key=os.path.getmtime, reverse=True):
+            run_id = os.path.basename(path)[len("crawl_"):-len(".jsonl")]
+            checkpoint = cls(run_id, checkpoint_dir=checkpoint_dir)
+            if not checkpoint.finished:
+                return checkpoint
+            checkpoint.close()
+        return None
+
+    def _replay(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # Dòng cuối có thể bị ghi dở khi crawler chết
+                    continue
+                kind = event.get("event")
+                if kind == "start":
+                    self.csv_prefix = event.get("csv_prefix")
+                elif kind == "urls":
+                    self.processed_urls.update(event["urls"])
+                elif kind == "job_done":
+                    self.done_jobs.add(event["job"])
+                elif kind == "finished":
+                    self.finished = True
+
+    def _append(self, event):
+        event["ts"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def is_job_done(self, job):
+        return job_key(job) in self.done_jobs
+
+    def is_url_processed(self, url):
+        return canonicalize_url(url) in self.processed_urls
+
+    def mark_rows(self, rows):
+        """Callback của StreamingCsvWriter: ghi nhận URL của các dòng vừa flush."""
+        urls = [canonicalize_url(r['article_url']) for r in rows]
+        self.processed_urls.update(urls)
+        self._append({"event": "urls", "urls": urls})
+
+    def mark_job_done(self, job):
+        self.done_jobs.add(job_key(job))
+        self._append({"event": "job_done", "job": job_key(job)})
+
+    def mark_finished(self):
+        self.finished = True
+        self._append({"event": "finished"})
+
+    def close(self):
+        self._file.close()
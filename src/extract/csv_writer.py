@@ -0,0 +1,105 @@
+import io
+import os
+import csv
+import gzip
+import threading
+from datetime import datetime
+
+# Thứ tự cột của file article_*.csv (StagingLoader đọc theo tên cột)
+ARTICLE_COLUMNS = [
+    'article_url', 'source_name_raw', 'category_raw', 'author_raw', 'published_at_raw',
+    'title_raw', 'summary_raw', 'content_raw', 'tags_raw', 'scraped_at', 'run_id',
+    'categories_raw'
+]
+
+
+# =============================================
+# STREAMING CSV WRITER
+# Mục đích: Ghi dữ liệu crawl ra CSV ngay trong lúc crawl (không giữ toàn bộ trong RAM)
+# =============================================
+class StreamingCsvWriter:
+    """
+    Ghi nối tiếp vào các file part: article_{ddmmyy}_{HHMMSS}_part001.csv[.gz], ...
+    - Flush sau mỗi `flush_rows` dòng (hoặc khi gọi flush()): mở file part ở chế độ append,
+      ghi rồi fsync. Với .gz mỗi lần flush là 1 gzip member hoàn chỉnh (có trailer), nên
+      crawler chết giữa chừng thì mọi dòng đã flush vẫn đọc được.
+    - Sang file part mới khi file hiện tại vượt `max_bytes`.
+    - `on_flush(rows)` được gọi sau mỗi lần flush, khi các dòng đã nằm trên đĩa (dùng cho checkpoint).
+    """
+
+    def __init__(self, output_dir="source", flush_rows=200, max_bytes=50 * 1024 * 1024, compress=False, prefix=None, on_flush=None):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.flush_rows = flush_rows
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.prefix = prefix or f"article_{datetime.now().strftime('%d%m%y_%H%M%S')}"
+        self.on_flush = on_flush
+
+        self.parts = []
+        self.total_rows = 0
+        self._buffer = []
+        self._path = None
+        self._lock = threading.Lock()
+
+    def _next_part_path(self):
+        ext = ".csv.gz" if self.compress else ".csv"
+        index = len(self.parts) + 1
+        path = os.path.join(self.output_dir, f"{self.prefix}_part{index:03d}{ext}")
+        # Không ghi đè part đã có (vd: chạy tiếp một lượt crawl cũ)
+        while os.path.exists(path):
+            index += 1
+            path = os.path.join(self.output_dir, f"{self.prefix}_part{index:03d}{ext}")
+        return path
+
+    def _encode(self, rows, header):
+        text = io.StringIO(newline="")
+        writer = csv.DictWriter(text, fieldnames=ARTICLE_COLUMNS, extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        # BOM chỉ ở đầu file (giống encoding utf-8-sig khi ghi cả file 1 lần)
+        data = text.getvalue().encode("utf-8-sig" if header else "utf-8")
+        return gzip.compress(data) if self.compress else data
+
+    def _append(self, data):
+        with open(self._path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_rows(self, rows):
+        """Thêm dòng vào buffer, tự flush khi đủ `flush_rows` dòng."""
+        with self._lock:
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self):
+        """Ghi toàn bộ buffer xuống đĩa (fsync) và báo on_flush."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        header = self._path is None
+        if header:
+            self._path = self._next_part_path()
+            self.parts.append(self._path)
+        self._append(self._encode(self._buffer, header))
+        self.total_rows += len(self._buffer)
+        flushed, self._buffer = self._buffer, []
+        if self.on_flush:
+            self.on_flush(flushed)
+
+        # Xoay file khi vượt dung lượng
+        if os.path.getsize(self._path) >= self.max_bytes:
+            self._path = None
+
+    def close(self):
+        """Flush phần còn lại. Trả về danh sách file part đã ghi."""
+        with self._lock:
+            self._flush_locked()
+            self._path = None
+        return self.parts
@@ -0,0 +1,161 @@
+import threading
+import queue
+from concurrent.futures import Future
+
+import psutil
+
+
+# =============================================
+# DRIVER POOL
+# Mục đích: Chạy N Selenium driver song song, cùng lấy URL từ một hàng đợi chung
+# =============================================
+class DriverPool:
+    """
+    Pool gồm N worker, mỗi worker giữ một driver riêng và lấy task từ hàng đợi chung.
+    - Driver được tái tạo sau `max_pages` trang hoặc khi RAM vượt `max_memory_mb`.
+    - Driver bị crash sẽ được thay thế, task đang chạy được thử lại (không làm fail job).
+    - on_quit(driver) (nếu có) được gọi ngay trước khi 1 driver bị quit, để dọn trạng thái gắn với driver đó.
+    """
+
+    def __init__(self, driver_factory, size=4, max_pages=50, max_memory_mb=1024, max_retries=2, on_quit=None):
+        self.driver_factory = driver_factory
+        self.on_quit = on_quit
+        self.size = max(1, int(size))
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.max_retries = max_retries
+
+        self.tasks = queue.Queue()
+        self.stats = {"pages": 0, "recycled": 0, "crashed": 0}
+        self._stats_lock = threading.Lock()
+        self._workers = []
+        for i in range(self.size):
+            t = threading.Thread(target=self._worker_loop, name=f"driver-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def submit(self, fn, *args):
+        """
+        Đưa task vào hàng đợi. Worker sẽ gọi fn(driver, *args).
+        Trả về Future chứa kết quả.
+        """
+        future = Future()
+        self.tasks.put((future, fn, args))
+        return future
+
+    def map(self, fn, args_list):
+        """Chạy fn cho từng bộ tham số, trả về kết quả theo đúng thứ tự đầu vào."""
+        futures = [self.submit(fn, *args) for args in args_list]
+        return [f.result() for f in futures]
+
+    def close(self):
+        """Dừng toàn bộ worker và thoát driver."""
+        for _ in self._workers:
+            self.tasks.put(None)
+        for t in self._workers:
+            t.join()
+        print(f"[POOL] Đã đóng {self.size} driver | Trang: {self.stats['pages']} | "
+              f"Tái tạo: {self.stats['recycled']} | Crash: {self.stats['crashed']}")
+
+    # =============================
+    # Worker
+    # =============================
+    def _worker_loop(self):
+        driver = None
+        pages = 0
+        while True:
+            item = self.tasks.get()
+            if item is None:
+                break
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            attempt = 0
+            while True:
+                # 1: Tạo driver khi chưa có (lần đầu hoặc sau khi tái tạo / crash)
+                if driver is None:
+                    try:
+                        driver = self.driver_factory()
+                        pages = 0
+                    except Exception as e:
+                        future.set_exception(e)
+                        break
+
+                # 2: Thực thi task
+                try:
+                    result = fn(driver, *args)
+                    error = None
+                except Exception as e:
+                    result, error = None, e
+
+                # 3: Task lỗi và driver đã chết -> thay driver, thử lại
+                if (error is not None or result is None) and not self._is_alive(driver):
+                    self._count("crashed")
+                    self._quit(driver)
+                    driver = None
+                    attempt += 1
+                    if attempt <= self.max_retries:
+                        continue
+
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+                break
+
+            # 4: Tái tạo driver khi đủ số trang hoặc vượt trần RAM
+            if driver is not None:
+                pages += 1
+                self._count("pages")
+                if self._should_recycle(driver, pages):
+                    self._count("recycled")
+                    self._quit(driver)
+                    driver = None
+
+        self._quit(driver)
+
+    def _should_recycle(self, driver, pages):
+        if self.max_pages and pages >= self.max_pages:
+            return True
+        if self.max_memory_mb and driver_memory_mb(driver) >= self.max_memory_mb:
+            return True
+        return False
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, driver):
+        if driver is None:
+            return
+        try:
+            if self.on_quit:
+                self.on_quit(driver)
+            driver.quit()
+        except Exception:
+            pass
+
+
+def driver_memory_mb(driver):
+    """Tổng RSS (MB) của chromedriver và toàn bộ tiến trình Chrome con."""
+    try:
+        proc = psutil.Process(driver.service.process.pid)
+        procs = [proc] + proc.children(recursive=True)
+        total = 0
+        for p in procs:
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return total / (1024 * 1024)
+    except Exception:
+        return 0
@@ -0,0 +1,52 @@
+import threading
+
+from extract.url_utils import canonicalize_url
+
+
+# =============================================
+# CRAWL FRONTIER
+# Mục đích: Khử trùng URL giữa tất cả các job trong cùng một lượt crawl
+# =============================================
+class CrawlFrontier:
+    """
+    Mỗi URL (đã chuẩn hóa) chỉ được giao cho job đầu tiên tìm thấy nó.
+    Các job sau tìm thấy lại URL đó chỉ được ghi nhận thêm category.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.owner = {}        # url_key -> job_key sở hữu URL
+        self.urls = {}         # url_key -> URL gốc (lần đầu thấy)
+        self.categories = {}   # url_key -> danh sách category đã link tới URL
+        self.job_stats = {}    # job_key -> {'links', 'unique', 'dup'}
+
+    def add(self, job_key, url, category):
+        """Thêm URL tìm thấy bởi job. Trả về True nếu URL mới trong lượt crawl này."""
+        key = canonicalize_url(url)
+        with self._lock:
+            stats = self.job_stats.setdefault(job_key, {'links': 0, 'unique': 0, 'dup': 0})
+            stats['links'] += 1
+            if key in self.owner:
+                stats['dup'] += 1
+                if category not in self.categories[key]:
+                    self.categories[key].append(category)
+                return False
+            stats['unique'] += 1
+            self.owner[key] = job_key
+            self.urls[key] = url
+            self.categories[key] = [category]
+            return True
+
+    def owned_urls(self, job_key):
+        """Danh sách URL mà job phải crawl (theo thứ tự tìm thấy)."""
+        with self._lock:
+            return [self.urls[k] for k, owner in self.owner.items() if owner == job_key]
+
+    def categories_for(self, url):
+        """Tất cả category đã link tới URL."""
+        with self._lock:
+            return list(self.categories.get(canonicalize_url(url), []))
+
+    def job_summary(self, job_key):
+        stats = self.job_stats.get(job_key, {'links': 0, 'unique': 0, 'dup': 0})
+        return f"links={stats['links']}, unique={stats['unique']}, dup={stats['dup']}"
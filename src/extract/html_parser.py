@@ -0,0 +1,171 @@
+import threading
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from lxml.cssselect import CSSSelector
+
+# Các trường bài viết lấy bằng safe_extract (trường -> khóa selector trong SELECTOR_LOOKUP)
+ARTICLE_FIELDS = {
+    'author_raw': 'ten_tac_gia',
+    'published_at_raw': 'ngay_xuat_ban',
+    'title_raw': 'tieu_de',
+    'summary_raw': 'summary',
+    'content_raw': 'content_raw',
+}
+
+# Nội dung trong các thẻ này không được BeautifulSoup coi là text
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+
+# =============================================
+# BACKEND BEAUTIFULSOUP (html.parser) - cách làm gốc
+# =============================================
+def safe_extract(soup, selector, default='N/A'):
+    try:
+        elements = soup.select(selector)
+
+        if len(elements) > 1:
+            text_list = [el.get_text(strip=True) for el in elements]
+            return "\n".join(text_list)
+        elif len(elements) == 1:
+            return elements[0].get_text(strip=True)
+        else:
+            return default
+    except:
+        return default
+
+def extract_fields_bs4(html, source_cfg):
+    s = source_cfg['selectors']
+    soup = BeautifulSoup(html, "html.parser")
+
+    tags = "N/A"
+    tag_els = soup.select(s['tags'])
+    if tag_els:
+        tags = ", ".join([t.get_text(strip=True) for t in tag_els])
+
+    fields = {field: safe_extract(soup, s[key]) for field, key in ARTICLE_FIELDS.items()}
+    fields['tags_raw'] = tags
+    return fields
+
+def extract_links_bs4(html, source_cfg):
+    soup = BeautifulSoup(html, "html.parser")
+    return [link.get('href') for link in soup.select(source_cfg['selectors']['article_link'])]
+
+def has_selectors_bs4(html, source_cfg, keys):
+    soup = BeautifulSoup(html, "html.parser")
+    return all(soup.select_one(source_cfg['selectors'][k]) for k in keys)
+
+
+# =============================================
+# BACKEND LXML - selector biên dịch sẵn theo nguồn
+# Lưu ý: lxml sửa HTML lồng thẻ sai khác html.parser nên kết quả có thể khác bs4
+#        trên trang lỗi cấu trúc -> kiểm tra bằng bench_parser.py trước khi bật
+# =============================================
+_compiled_cache = {}
+_compiled_lock = threading.Lock()
+
+def compile_source(source_name, source_cfg):
+    """Biên dịch (1 lần / nguồn) các CSS selector của nguồn sang XPath."""
+    compiled = _compiled_cache.get(source_name)
+    if compiled is None:
+        with _compiled_lock:
+            compiled = _compiled_cache.get(source_name)
+            if compiled is None:
+                compiled = {
+                    'selectors': {k: CSSSelector(v) for k, v in source_cfg['selectors'].items()},
+                }
+                _compiled_cache[source_name] = compiled
+    return compiled
+
+def _parse(html):
+    return lxml_html.document_fromstring(html)
+
+def _iter_strings(el):
+    """Duyệt text theo thứ tự tài liệu, bỏ comment và nội dung script/style (giống BeautifulSoup)."""
+    if isinstance(el.tag, str) and el.tag not in NON_TEXT_TAGS and el.text:
+        yield el.text
+    if isinstance(el.tag, str) and el.tag in NON_TEXT_TAGS:
+        return
+    for child in el:
+        yield from _iter_strings(child)
+        if child.tail:
+            yield child.tail
+
+def get_text_strip(el):
+    """Tương đương Tag.get_text(strip=True) của BeautifulSoup."""
+    return "".join(s for s in (t.strip() for t in _iter_strings(el)) if s)
+
+def extract_fields_lxml(html, source_name, source_cfg):
+    return _extract_from_root(_parse(html), compile_source(source_name, source_cfg))
+
+def _extract_from_root(root, compiled):
+    # Luôn select trên toàn trang như bs4 (không giới hạn trong container bài viết)
+    sel = compiled['selectors']
+    fields = {}
+    for field, key in ARTICLE_FIELDS.items():
+        elements = sel[key](root)
+        if len(elements) > 1:
+            fields[field] = "\n".join(get_text_strip(el) for el in elements)
+        elif len(elements) == 1:
+            fields[field] = get_text_strip(elements[0])
+        else:
+            fields[field] = 'N/A'
+
+    tag_els = sel['tags'](root)
+    fields['tags_raw'] = ", ".join(get_text_strip(t) for t in tag_els) if tag_els else "N/A"
+    return fields
+
+def extract_links_lxml(html, source_name, source_cfg):
+    compiled = compile_source(source_name, source_cfg)
+    return [link.get('href') for link in compiled['selectors']['article_link'](_parse(html))]
+
+def has_selectors_lxml(html, source_name, source_cfg, keys):
+    compiled = compile_source(source_name, source_cfg)
+    root = _parse(html)
+    return all(compiled['selectors'][k](root) for k in keys)
+
+
+# =============================================
+# CHỌN BACKEND
+# =============================================
+def extract_fields(html, source_name, source_cfg, backend='lxml'):
+    if backend == 'lxml':
+        try:
+            return extract_fields_lxml(html, source_name, source_cfg)
+        except (etree.ParserError, ValueError):
+            pass
+    return extract_fields_bs4(html, source_cfg)
+
+def extract_links(html, source_name, source_cfg, backend='lxml'):
+    if backend == 'lxml':
+        try:
+            return extract_links_lxml(html, source_name, source_cfg)
+        except (etree.ParserError, ValueError):
+            pass
+    return extract_links_bs4(html, source_cfg)
+
+def parse_page(html, source_name, source_cfg, required_keys=(), backend='lxml'):
+    """
+    Hàm chạy trong tiến trình parser: kiểm tra selector bắt buộc rồi trích xuất trường.
+    Chỉ parse HTML 1 lần. Trả về None nếu trang thiếu selector bắt buộc.
+    """
+    if backend == 'lxml':
+        try:
+            compiled = compile_source(source_name, source_cfg)
+            root = _parse(html)
+            if not all(compiled['selectors'][k](root) for k in required_keys):
+                return None
+            return _extract_from_root(root, compiled)
+        except (etree.ParserError, ValueError):
+            pass
+    if required_keys and not has_selectors_bs4(html, source_cfg, required_keys):
+        return None
+    return extract_fields_bs4(html, source_cfg)
+
+def has_selectors(html, source_name, source_cfg, keys, backend='lxml'):
+    if backend == 'lxml':
+        try:
+            return has_selectors_lxml(html, source_name, source_cfg, keys)
+        except (etree.ParserError, ValueError):
+            pass
+    return has_selectors_bs4(html, source_cfg, keys)
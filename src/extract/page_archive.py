@@ -0,0 +1,128 @@
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from extract.url_utils import canonicalize_url
+
+
+# =============================================
+# PAGE ARCHIVE
+# Mục đích: Lưu trang đã tải (nén zlib, khóa theo URL) để chạy lại crawler offline
+# =============================================
+class PageArchive:
+    """
+    Kho trang dạng 1 file SQLite: bảng pages (url -> HTML nén) và meta (danh sách job, ...).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                raw_size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+    def record(self, url, html):
+        """Ghi 1 trang vào kho (ghi đè nếu đã có)."""
+        if not html:
+            return
+        raw = html.encode("utf-8")
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages (url, body, raw_size, fetched_at) VALUES (?, ?, ?, ?)",
+                (canonicalize_url(url), zlib.compress(raw, 6), len(raw), time.time()))
+            self.db.commit()
+
+    def get(self, url):
+        with self._lock:
+            row = self.db.execute("SELECT body FROM pages WHERE url = ?", (canonicalize_url(url),)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def save_jobs(self, jobs):
+        """Lưu danh sách job để benchmark chạy được mà không cần DB config."""
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('jobs', ?)",
+                            (json.dumps(jobs, ensure_ascii=False),))
+            self.db.commit()
+
+    def load_jobs(self):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'jobs'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    def summary(self):
+        with self._lock:
+            count, raw, packed = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM pages").fetchone()
+        return {'pages': count, 'raw_bytes': raw, 'packed_bytes': packed}
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def make_url_rewriter(replay_base_url):
+    """Hàm đổi URL gốc sang URL của replay server: https://host/path?q -> {base}/https/host/path?q"""
+    base = replay_base_url.rstrip("/")
+
+    def rewrite(url):
+        parts = urlsplit(url)
+        local = f"{base}/{parts.scheme or 'https'}/{parts.netloc}{parts.path}"
+        return f"{local}?{parts.query}" if parts.query else local
+    return rewrite
+
+
+# =============================================
+# REPLAY SERVER
+# Mục đích: Phục vụ trang trong kho qua HTTP local cho crawler (cả aiohttp và Selenium)
+# =============================================
+class ReplayServer:
+    def __init__(self, archive, host="127.0.0.1", port=0):
+        self.archive = archive
+        handler = self._make_handler(archive)
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.to_local = make_url_rewriter(self.base_url)
+        self._thread = None
+
+    @staticmethod
+    def _make_handler(archive):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                scheme, _, rest = self.path.lstrip("/").partition("/")
+                html = archive.get(f"{scheme}://{rest}") if scheme in ("http", "https") else None
+                if html is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        print(f"[REPLAY] Phục vụ kho trang tại {self.base_url}")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
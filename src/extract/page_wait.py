@@ -0,0 +1,66 @@
+import time
+import threading
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+DEFAULT_WAIT_TIMEOUT = 10
+
+
+# =============================================
+# PAGE WAITER
+# Mục đích: Chờ tới khi các selector cần thiết xuất hiện thay vì sleep cố định
+# =============================================
+class PageWaiter:
+    """
+    Chờ trang sẵn sàng theo cấu hình 'wait' của từng nguồn trong SELECTOR_LOOKUP
+    và thống kê thời gian chờ theo nguồn.
+    """
+
+    def __init__(self, poll_frequency=0.1):
+        self.poll_frequency = poll_frequency
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def wait(self, driver, job, page_type):
+        """
+        Chờ các selector của loại trang (`listing` / `article`) xuất hiện.
+        Trả về True nếu trang sẵn sàng, False nếu hết thời gian chờ.
+        """
+        wait_cfg = job.get('wait', {})
+        keys = wait_cfg.get(page_type, [])
+        selectors = [job['selectors'][k] for k in keys]
+        timeout = wait_cfg.get('timeout', DEFAULT_WAIT_TIMEOUT)
+
+        start = time.perf_counter()
+        ready = True
+        if selectors:
+            try:
+                WebDriverWait(driver, timeout, poll_frequency=self.poll_frequency).until(
+                    lambda d: all(d.find_elements(By.CSS_SELECTOR, sel) for sel in selectors)
+                )
+            except TimeoutException:
+                ready = False
+        self._record(job['source_name_raw'], page_type, time.perf_counter() - start, ready)
+        return ready
+
+    def _record(self, source, page_type, elapsed, ready):
+        with self._lock:
+            st = self.stats.setdefault((source, page_type), {
+                'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0
+            })
+            st['count'] += 1
+            st['total'] += elapsed
+            st['max'] = max(st['max'], elapsed)
+            if not ready:
+                st['timeouts'] += 1
+
+    def print_stats(self):
+        """In thống kê thời gian chờ theo từng nguồn / loại trang."""
+        print("[WAIT] Thống kê thời gian chờ trang:")
+        with self._lock:
+            for (source, page_type), st in sorted(self.stats.items()):
+                avg = st['total'] / st['count'] if st['count'] else 0
+                print(f"    {source:<12} {page_type:<8} | Số trang: {st['count']:>5} | "
+                      f"TB: {avg:.2f}s | Max: {st['max']:.2f}s | "
+                      f"Tổng: {st['total']:.1f}s | Timeout: {st['timeouts']}")
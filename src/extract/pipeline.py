@@ -0,0 +1,128 @@
+import time
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from extract.html_parser import parse_page
+from extract.rate_limiter import AdaptiveRateLimiter, DomainScheduler
+
+
+def timed_parse_page(*args):
+    """parse_page kèm thời gian parse (giây) đo trong tiến trình parser."""
+    start = time.perf_counter()
+    fields = parse_page(*args)
+    return fields, time.perf_counter() - start
+
+
+# =============================================
+# CRAWL PIPELINE
+# Mục đích: Tách 2 giai đoạn tải (I/O) và parse (CPU) thành producer/consumer
+# =============================================
+class CrawlPipeline:
+    """
+    - Producer: lấy URL từ DomainScheduler (xen kẽ các nguồn, giới hạn tốc độ theo domain),
+      tải HTML (aiohttp hoặc driver pool) và đẩy vào hàng đợi có giới hạn.
+    - Consumer: lấy HTML ra, gửi sang ProcessPoolExecutor để parse.
+    Số trang "đã tải nhưng chưa parse xong" không vượt quá `max_pending`
+    nên bộ nhớ giữ ổn định dù lượt crawl lớn cỡ nào.
+    """
+
+    def __init__(self, pool, fetch_html, fetcher=None, limiter=None, parse_workers=None, max_pending=64, backend='lxml'):
+        self.pool = pool                  # DriverPool
+        self.fetch_html = fetch_html      # fetch_html(driver, url, job) -> HTML hoặc None
+        self.fetcher = fetcher            # StaticFetcher (có thể None)
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.max_pending = max_pending
+        self.backend = backend
+        self.executor = ProcessPoolExecutor(max_workers=parse_workers)
+        self.fallback_count = 0
+        self.parsed_pages = 0
+        self.parse_seconds = 0.0
+
+    def _timed_fetch(self, driver, url, job):
+        start = time.perf_counter()
+        html = self.fetch_html(driver, url, job)
+        self.limiter.report(job['domain'], time.perf_counter() - start, 200 if html else None)
+        return html
+
+    def run(self, items, on_result):
+        """
+        Tải + parse toàn bộ URL của lượt crawl.
+        items: danh sách (job_key, job, url).
+        on_result(job_key, url, fields hoặc None) được gọi ở thread hiện tại khi 1 URL xử lý xong.
+        """
+        self.fallback_count = 0
+        if not items:
+            return
+
+        events = queue.Queue(maxsize=self.max_pending)
+        slots = threading.Semaphore(self.max_pending)
+        scheduler = DomainScheduler(self.limiter)
+
+        def push(kind, item, mode):
+            def callback(future):
+                try:
+                    payload = future.result()
+                except Exception:
+                    payload = None
+                events.put_nowait((kind, item, mode, payload))
+            return callback
+
+        def fetch(item, mode):
+            _, job, url = item
+            if mode == 'static':
+                domain = job['domain']
+                future = self.fetcher.submit(
+                    url, lambda status, latency: self.limiter.report(domain, latency, status))
+            else:
+                future = self.pool.submit(self._timed_fetch, url, job)
+            future.add_done_callback(push('fetched', item, mode))
+
+        # 1: Đưa toàn bộ URL vào scheduler theo domain của nguồn
+        for item in items:
+            job = item[1]
+            use_static = self.fetcher is not None and job.get('fetch_mode') == 'static'
+            scheduler.put((item, 'static' if use_static else 'selenium'), job['domain'])
+
+        # 2: Producer - chỉ tải thêm trang mới khi còn slot trống (backpressure)
+        def produce():
+            while True:
+                entry = scheduler.get(lambda: slots.acquire(blocking=False))
+                if entry is None:
+                    return
+                fetch(*entry)
+
+        threading.Thread(target=produce, name="pipeline-producer", daemon=True).start()
+
+        # 3: Consumer - parse HTML ở tiến trình khác, trang tĩnh không đạt thì tải lại bằng Selenium
+        remaining = len(items)
+        while remaining:
+            kind, item, mode, payload = events.get()
+            job_key, job, url = item
+
+            # 3.1: Kết quả parse là (fields, elapsed) -> lấy fields trước khi kiểm tra fallback
+            if kind == 'parsed' and payload is not None:
+                payload, elapsed = payload
+                self.parsed_pages += 1
+                self.parse_seconds += elapsed
+
+            if payload is None and mode == 'static':
+                self.fallback_count += 1
+                scheduler.put((item, 'selenium'), job['domain'], retry=True)
+                continue
+
+            if kind == 'fetched' and payload is not None:
+                keys = job.get('wait', {}).get('article', []) if mode == 'static' else ()
+                future = self.executor.submit(timed_parse_page, payload, job['source_name_raw'], job, keys, self.backend)
+                future.add_done_callback(push('parsed', item, mode))
+                continue
+
+            on_result(job_key, url, payload if kind == 'parsed' else None)
+            remaining -= 1
+            slots.release()
+            scheduler.notify()
+
+        scheduler.close()
+
+    def close(self):
+        self.executor.shutdown()
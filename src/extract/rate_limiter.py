@@ -0,0 +1,171 @@
+import time
+import threading
+from collections import OrderedDict, deque
+
+
+# =============================================
+# TOKEN BUCKET
+# =============================================
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Số giây phải chờ để có 1 token."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self):
+        """Lấy 1 token (có thể ứng trước). Trả về số giây phải chờ trước khi gửi request."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+# =============================================
+# ADAPTIVE RATE LIMITER
+# Mục đích: Giới hạn request theo domain, tự điều chỉnh tốc độ theo phản hồi của server
+# =============================================
+class AdaptiveRateLimiter:
+    """
+    Mỗi domain có 1 token bucket. Tốc độ điều chỉnh kiểu AIMD:
+    - 429 / 5xx / lỗi kết nối: giảm một nửa tốc độ
+    - latency vượt `latency_target`: giảm 10%
+    - thành công: tăng thêm `increase_step` request/giây (tối đa `max_rate`)
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=10.0, burst=4,
+                 latency_target=3.0, increase_step=0.1):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.latency_target = latency_target
+        self.increase_step = increase_step
+        self.buckets = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, domain):
+        bucket = self.buckets.get(domain)
+        if bucket is None:
+            bucket = self.buckets[domain] = TokenBucket(self.initial_rate, self.burst)
+            self.stats[domain] = {'requests': 0, 'throttled': 0, 'errors': 0, 'latency': 0.0}
+        return bucket
+
+    def wait_time(self, domain):
+        with self._lock:
+            return self._bucket(domain).wait_time()
+
+    def reserve(self, domain):
+        with self._lock:
+            return self._bucket(domain).reserve()
+
+    def acquire(self, domain):
+        """Chờ (blocking) tới lượt gửi request cho domain."""
+        delay = self.reserve(domain)
+        if delay > 0:
+            time.sleep(delay)
+
+    def report(self, domain, latency, status):
+        """Ghi nhận kết quả 1 request. status=None nghĩa là lỗi kết nối / timeout."""
+        with self._lock:
+            bucket = self._bucket(domain)
+            st = self.stats[domain]
+            st['requests'] += 1
+            st['latency'] += latency
+
+            if status == 429 or status is None or status >= 500:
+                st['throttled' if status == 429 else 'errors'] += 1
+                bucket.rate = max(self.min_rate, bucket.rate * 0.5)
+            elif latency > self.latency_target:
+                bucket.rate = max(self.min_rate, bucket.rate * 0.9)
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase_step)
+
+    def print_stats(self):
+        print("[RATE] Thống kê theo domain:")
+        with self._lock:
+            for domain, st in sorted(self.stats.items()):
+                avg = st['latency'] / st['requests'] if st['requests'] else 0
+                print(f"    {domain:<22} | Request: {st['requests']:>5} | 429: {st['throttled']} | "
+                      f"Lỗi: {st['errors']} | Latency TB: {avg:.2f}s | "
+                      f"Tốc độ hiện tại: {self.buckets[domain].rate:.2f} req/s")
+
+
+# =============================================
+# DOMAIN SCHEDULER
+# Mục đích: Xen kẽ URL của mọi nguồn, luôn lấy URL của domain sớm có token nhất
+# =============================================
+class DomainScheduler:
+    """
+    Hàng đợi theo domain. `get()` trả về phần tử của domain được phép gửi request sớm nhất
+    (hòa thì ưu tiên domain lâu chưa được phục vụ), và chờ tới lượt theo rate limiter.
+    Phần tử `retry=True` (vd: tải lại bằng Selenium) không cần slot mới.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self._new = OrderedDict()
+        self._retry = OrderedDict()
+        self._last_served = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item, domain, retry=False):
+        with self._cond:
+            queues = self._retry if retry else self._new
+            queues.setdefault(domain, deque()).append(item)
+            self._cond.notify_all()
+
+    def notify(self):
+        """Đánh thức get() (vd: khi có slot trống)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _pick(self, try_acquire_slot):
+        candidates = []
+        for kind, queues in ((0, self._retry), (1, self._new)):
+            for domain, items in queues.items():
+                if items:
+                    wait = self.limiter.wait_time(domain)
+                    candidates.append((wait, kind, self._last_served.get(domain, 0), domain, items))
+        candidates.sort(key=lambda c: c[:3])
+
+        for wait, kind, _, domain, items in candidates:
+            # Phần tử mới chỉ được lấy khi pipeline còn slot
+            if kind == 1 and try_acquire_slot is not None and not try_acquire_slot():
+                continue
+            return domain, items
+        return None
+
+    def get(self, try_acquire_slot=None):
+        """Lấy phần tử kế tiếp. Trả về None khi scheduler đã đóng."""
+        while True:
+            with self._cond:
+                if self._closed:
+                    return None
+                choice = self._pick(try_acquire_slot)
+                if choice is None:
+                    self._cond.wait(0.1)
+                    continue
+                domain, items = choice
+                item = items.popleft()
+                self._last_served[domain] = time.monotonic()
+                delay = self.limiter.reserve(domain)
+            if delay > 0:
+                time.sleep(delay)
+            return item
@@ -0,0 +1,132 @@
+import json
+import threading
+from fnmatch import fnmatchcase
+
+# Mẫu URL chặn mặc định (quảng cáo, tracking, video, font, ảnh) - cú pháp wildcard của Network.setBlockedURLs
+DEFAULT_BLOCK_PATTERNS = [
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*googletagservices.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*scorecardresearch.com*",
+    "*admicro.vn*", "*adtima.vn*", "*ants.vn*", "*dable.io*", "*taboola.com*",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    "*youtube.com/embed*", "*jwplayer*", "*.m3u8*", "*.mp4*",
+    "*.woff*", "*.woff2*", "*.ttf*", "*.otf*",
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*",
+]
+
+# Kích thước ước lượng (byte) theo loại tài nguyên, dùng khi phiên chưa đo được loại đó
+TYPICAL_SIZE = {
+    "Script": 40_000, "Image": 30_000, "Font": 50_000, "Media": 500_000,
+    "Stylesheet": 20_000, "XHR": 5_000, "Fetch": 5_000, "Other": 10_000,
+}
+
+
+def is_allowed(pattern, allow):
+    """
+    Mẫu mặc định bị bỏ nếu khớp 1 mục allow:
+    - trùng đúng chuỗi mẫu, hoặc mục allow là wildcard khớp chuỗi mẫu (vd: '*font*' bỏ mọi mẫu font);
+    - hoặc mục allow là URL / host mà mẫu sẽ chặn (vd: 'fonts.gstatic.com' bỏ '*fonts.gstatic.com*').
+    Network.setBlockedURLs không có ngoại lệ nên allow bỏ cả mẫu: allow 'cdn.x/logo.png' bỏ luôn '*.png*'.
+    """
+    return any(pattern == a or fnmatchcase(pattern, a) or fnmatchcase(a, pattern) for a in allow)
+
+
+def get_block_patterns(job, defaults=DEFAULT_BLOCK_PATTERNS):
+    """Danh sách mẫu chặn của nguồn: mặc định - allow + deny (cấu hình 'block' trong SELECTOR_LOOKUP)."""
+    cfg = job.get('block') or {}
+    allow = cfg.get('allow', [])
+    patterns = [p for p in defaults if not is_allowed(p, allow)]
+    patterns += [p for p in cfg.get('deny', []) if p not in patterns]
+    return patterns
+
+
+# =============================================
+# RESOURCE BLOCKER
+# Mục đích: Chặn tài nguyên bên thứ 3 ở tầng mạng qua Chrome DevTools Protocol
+# =============================================
+class ResourceBlocker:
+    """
+    - apply(): đặt danh sách URL bị chặn cho driver (Network.setBlockedURLs) theo nguồn.
+    - forget(): bỏ trạng thái đã lưu của driver khi driver bị thoát (DriverPool on_quit).
+    - collect(): đọc performance log của trang vừa tải, đếm request bị chặn và ước lượng byte tiết kiệm.
+    Byte tiết kiệm = số request bị chặn x kích thước trung bình cùng loại đã đo được trong phiên
+    (chưa đo được thì dùng TYPICAL_SIZE).
+    """
+
+    def __init__(self, defaults=DEFAULT_BLOCK_PATTERNS):
+        self.defaults = defaults
+        self.stats = {}
+        self._applied = {}
+        self._type_bytes = {}
+        self._lock = threading.Lock()
+
+    def apply(self, driver, job):
+        patterns = get_block_patterns(job, self.defaults)
+        if self._applied.get(driver.session_id) != patterns:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+            self._applied[driver.session_id] = patterns
+        # Bỏ log của trang trước để collect() chỉ đọc log của trang sắp tải
+        self._read_events(driver)
+
+    def forget(self, driver):
+        """Driver sắp quit (tái tạo / crash / đóng pool): xóa mẫu đã đặt theo session_id của nó."""
+        self._applied.pop(getattr(driver, "session_id", None), None)
+
+    @staticmethod
+    def _read_events(driver):
+        try:
+            entries = driver.get_log("performance")
+        except Exception:
+            return []
+        events = []
+        for entry in entries:
+            try:
+                events.append(json.loads(entry["message"])["message"])
+            except (KeyError, ValueError):
+                continue
+        return events
+
+    def collect(self, driver, job):
+        """Thống kê trang vừa tải. Trả về dict {'blocked', 'loaded_bytes', 'saved_bytes'}."""
+        types = {}
+        blocked_types = []
+        loaded_bytes = 0
+        for event in self._read_events(driver):
+            method, params = event.get("method"), event.get("params", {})
+            if method == "Network.requestWillBeSent":
+                types[params.get("requestId")] = params.get("type", "Other")
+            elif method == "Network.loadingFailed" and params.get("blockedReason") == "inspector":
+                blocked_types.append(types.get(params.get("requestId"), params.get("type", "Other")))
+            elif method == "Network.loadingFinished":
+                size = params.get("encodedDataLength", 0)
+                loaded_bytes += size
+                self._learn(types.get(params.get("requestId"), "Other"), size)
+
+        saved_bytes = sum(self._estimate(t) for t in blocked_types)
+        page = {'blocked': len(blocked_types), 'loaded_bytes': loaded_bytes, 'saved_bytes': saved_bytes}
+        with self._lock:
+            st = self.stats.setdefault(job['source_name_raw'], {'pages': 0, 'blocked': 0, 'loaded_bytes': 0, 'saved_bytes': 0})
+            st['pages'] += 1
+            for k, v in page.items():
+                st[k] += v
+        return page
+
+    def _learn(self, rtype, size):
+        with self._lock:
+            total, count = self._type_bytes.get(rtype, (0, 0))
+            self._type_bytes[rtype] = (total + size, count + 1)
+
+    def _estimate(self, rtype):
+        with self._lock:
+            total, count = self._type_bytes.get(rtype, (0, 0))
+        return total / count if count else TYPICAL_SIZE.get(rtype, TYPICAL_SIZE["Other"])
+
+    def print_stats(self):
+        print("[BLOCK] Tài nguyên bị chặn theo nguồn (trung bình / trang):")
+        with self._lock:
+            for source, st in sorted(self.stats.items()):
+                pages = st['pages'] or 1
+                print(f"    {source:<12} | Số trang: {st['pages']:>5} | Bị chặn: {st['blocked'] / pages:.1f} request | "
+                      f"Đã tải: {st['loaded_bytes'] / pages / 1024:.0f} KB | "
+                      f"Tiết kiệm ~{st['saved_bytes'] / pages / 1024:.0f} KB")
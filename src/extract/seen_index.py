@@ -0,0 +1,149 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+
+from extract.url_utils import canonicalize_url
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_INDEX_DIR = os.path.join(BASE_DIR, "source", "cache")
+
+# Câu truy vấn lấy URL đã có trong kho để khởi tạo index lần đầu
+SEED_QUERIES = [
+    ("news_warehouse_db", os.getenv("SEEN_URL_WAREHOUSE_QUERY", "SELECT article_url FROM DimArticle")),
+    ("news_staging_db", "SELECT article_url FROM staging_temp_table"),
+]
+
+
+# =============================================
+# BLOOM FILTER
+# Mục đích: Kiểm tra nhanh "chắc chắn chưa thấy" trước khi tra kho chính xác
+# =============================================
+class BloomFilter:
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.num_bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def save(self, path):
+        with open(path + ".tmp", "wb") as f:
+            f.write(self.bits)
+        os.replace(path + ".tmp", path)
+
+    def load(self, path):
+        """Nạp bit từ file. Trả về False nếu file không tồn tại hoặc sai kích thước."""
+        if not os.path.exists(path) or os.path.getsize(path) != len(self.bits):
+            return False
+        with open(path, "rb") as f:
+            self.bits = bytearray(f.read())
+        return True
+
+
+# =============================================
+# SEEN URL INDEX
+# Mục đích: Lưu các URL đã crawl (trên đĩa) để lượt crawl sau bỏ qua bài đã có
+# =============================================
+class SeenUrlIndex:
+    """
+    Bloom filter (bộ nhớ + file .bloom) đứng trước kho chính xác SQLite.
+    Khóa là URL đã chuẩn hóa; giá trị là thời điểm lần đầu thấy URL.
+    """
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, recrawl_hours=0, capacity=1_000_000):
+        os.makedirs(index_dir, exist_ok=True)
+        self.recrawl_seconds = recrawl_hours * 3600
+        self.db_path = os.path.join(index_dir, "seen_urls.sqlite")
+        self.bloom_path = os.path.join(index_dir, "seen_urls.bloom")
+        self._lock = threading.Lock()
+
+        # 1: Mở kho chính xác
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL
+            )
+        """)
+
+        # 2: Nạp Bloom filter, dựng lại từ kho nếu file .bloom không dùng được.
+        #    File .bloom bị xóa sau khi nạp, chỉ ghi lại khi close() -> nếu crawler
+        #    chết giữa chừng thì lần sau sẽ dựng lại từ kho, không dùng bit cũ.
+        self.bloom = BloomFilter(capacity)
+        if self.bloom.load(self.bloom_path):
+            os.remove(self.bloom_path)
+        else:
+            for (url,) in self.db.execute("SELECT url FROM seen_urls"):
+                self.bloom.add(url)
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    def seed_from_db(self, connect):
+        """
+        Khởi tạo index từ URL đã có trong warehouse/staging (chỉ chạy khi index rỗng).
+        `connect` là hàm nhận tên DB và trả về connection (vd: connect_to_db).
+        """
+        if len(self) > 0:
+            return 0
+        total = 0
+        for db_name, query in SEED_QUERIES:
+            conn = connect(db_name)
+            if not conn:
+                continue
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query)
+                urls = [row[0] for row in cursor.fetchall() if row[0]]
+                cursor.close()
+                total += self.add_many(urls, first_seen=0)
+            except Exception as e:
+                print(f"[SEEN] Bỏ qua seed từ {db_name}: {e}")
+            finally:
+                conn.close()
+        print(f"[SEEN] Đã seed {total} URL vào index.")
+        return total
+
+    def should_crawl(self, url):
+        """True nếu URL chưa từng thấy, hoặc mới thấy trong vòng `recrawl_hours` giờ."""
+        key = canonicalize_url(url)
+        if key not in self.bloom:
+            return True
+        with self._lock:
+            row = self.db.execute("SELECT first_seen FROM seen_urls WHERE url = ?", (key,)).fetchone()
+        if row is None:
+            return True
+        return self.recrawl_seconds > 0 and time.time() - row[0] < self.recrawl_seconds
+
+    def add_many(self, urls, first_seen=None):
+        """Ghi nhận danh sách URL đã crawl. Trả về số URL mới."""
+        now = time.time() if first_seen is None else first_seen
+        keys = [canonicalize_url(u) for u in urls]
+        with self._lock:
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO seen_urls (url, first_seen) VALUES (?, ?)",
+                                [(k, now) for k in keys])
+            self.db.commit()
+            added = self.db.total_changes - before
+            for k in keys:
+                self.bloom.add(k)
+        return added
+
+    def close(self):
+        with self._lock:
+            self.bloom.save(self.bloom_path)
+            self.db.close()
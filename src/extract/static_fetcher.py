@@ -0,0 +1,97 @@
+import time
+import asyncio
+import threading
+
+import aiohttp
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+}
+
+
+# =============================================
+# STATIC FETCHER
+# Mục đích: Tải HTML tĩnh bằng aiohttp (keep-alive, giới hạn kết nối theo host)
+# =============================================
+class StaticFetcher:
+    """
+    HTTP client bất đồng bộ chạy trên một event loop riêng (thread nền),
+    cho phép code đồng bộ của crawler gọi `fetch_many` như hàm thường.
+    """
+
+    def __init__(self, total_limit=32, per_host_limit=8, timeout=15, headers=None, url_rewriter=None, recorder=None):
+        self.total_limit = total_limit
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.url_rewriter = url_rewriter  # url -> URL thực sự gửi request (vd: replay server)
+        self.recorder = recorder          # recorder(url, html) sau mỗi trang tải thành công
+        self.stats = {"ok": 0, "failed": 0}
+
+        # 1: Tạo event loop riêng chạy ở thread nền
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="static-fetcher", daemon=True)
+        self._thread.start()
+
+        # 2: Tạo session dùng chung (connection pool keep-alive)
+        self._session = self._run(self._create_session())
+
+    async def _create_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.total_limit,
+            limit_per_host=self.per_host_limit,
+            keepalive_timeout=30,
+            ttl_dns_cache=300
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _fetch(self, url, on_response=None):
+        """Tải 1 URL. on_response(status, latency) nhận mã HTTP (None nếu lỗi kết nối)."""
+        start = time.perf_counter()
+        status, html = None, None
+        try:
+            target = self.url_rewriter(url) if self.url_rewriter else url
+            async with self._session.get(target) as resp:
+                status = resp.status
+                if status == 200:
+                    html = await resp.text(errors="replace")
+        except Exception:
+            pass
+        self.stats["ok" if html is not None else "failed"] += 1
+        if html is not None and self.recorder:
+            self.recorder(url, html)
+        if on_response:
+            on_response(status, time.perf_counter() - start)
+        return html
+
+    async def _fetch_all(self, urls):
+        return await asyncio.gather(*(self._fetch(url) for url in urls))
+
+    def submit(self, url, on_response=None):
+        """Đưa 1 URL vào event loop, trả về concurrent Future chứa HTML (hoặc None)."""
+        return asyncio.run_coroutine_threadsafe(self._fetch(url, on_response), self._loop)
+
+    def fetch(self, url):
+        """Tải 1 trang. Trả về HTML hoặc None nếu lỗi."""
+        return self._run(self._fetch(url))
+
+    def fetch_many(self, urls):
+        """Tải song song nhiều trang. Trả về dict {url: html hoặc None}."""
+        results = self._run(self._fetch_all(urls))
+        return dict(zip(urls, results))
+
+    def close(self):
+        """Đóng session và dừng event loop."""
+        self._run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        print(f"[STATIC] Tải thành công: {self.stats['ok']} | Lỗi: {self.stats['failed']}")
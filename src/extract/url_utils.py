@@ -0,0 +1,38 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Các tham số tracking không làm thay đổi nội dung bài viết:
+# so khớp đúng tên (ref không được làm mất referrer, refresh, ref_id...) và theo tiền tố (utm_*)
+TRACKING_PARAMS = {"fbclid", "gclid", "zarsrc", "ref"}
+TRACKING_PARAM_PREFIXES = ("utm_",)
+
+
+def is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Chuẩn hóa URL bài viết để dùng làm khóa so sánh:
+    - scheme/host viết thường, bỏ 'www.'
+    - bỏ fragment (#...) và các tham số tracking
+    - bỏ dấu '/' thừa ở cuối path
+    """
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "https").lower()
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not is_tracking_param(k)]
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+
+def url_domain(url):
+    """Lấy domain (đã bỏ 'www.') của URL, dùng làm khóa giới hạn tốc độ."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
@@ -1,19 +1,82 @@
 import sys
 import os
-import uuid
 import time
-import pandas as pd
+import uuid
+import argparse
+from itertools import zip_longest
 from datetime import datetime
-from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.db_utils import connect_to_db
-from utils.log_utils import log_start, log_end
+from utils.db_utils import connect_to_db, print_pool_stats
+from utils.log_utils import log_start, log_end, reserve_job
+from utils.metrics import RunMetrics
+from extract.driver_pool import DriverPool
+from extract.page_wait import PageWaiter
+from extract.static_fetcher import StaticFetcher
+from extract.seen_index import SeenUrlIndex
+from extract.frontier import CrawlFrontier
+from extract.html_parser import extract_links, has_selectors
+from extract.pipeline import CrawlPipeline
+from extract.csv_writer import StreamingCsvWriter
+from extract.checkpoint import CrawlCheckpoint, DEFAULT_CHECKPOINT_DIR
+from extract.rate_limiter import AdaptiveRateLimiter
+from extract.url_utils import url_domain
+from extract.resource_blocker import ResourceBlocker
+from extract.page_archive import PageArchive, make_url_rewriter
+
+# Cấu hình pool driver (có thể ghi đè bằng biến môi trường)
+CRAWL_POOL_SIZE = int(os.getenv("CRAWL_POOL_SIZE", "4"))
+CRAWL_DRIVER_MAX_PAGES = int(os.getenv("CRAWL_DRIVER_MAX_PAGES", "50"))
+CRAWL_DRIVER_MAX_MEMORY_MB = int(os.getenv("CRAWL_DRIVER_MAX_MEMORY_MB", "1024"))
+
+# Cấu hình tải tĩnh (aiohttp) cho các nguồn có fetch_mode = 'static'
+CRAWL_STATIC_ENABLED = os.getenv("CRAWL_STATIC_ENABLED", "1") == "1"
+CRAWL_STATIC_PER_HOST = int(os.getenv("CRAWL_STATIC_PER_HOST", "8"))
+
+# Bỏ qua bài đã crawl; bài mới thấy trong vòng N giờ vẫn được crawl lại (0 = không crawl lại)
+CRAWL_SKIP_SEEN = os.getenv("CRAWL_SKIP_SEEN", "1") == "1"
+CRAWL_RECRAWL_HOURS = float(os.getenv("CRAWL_RECRAWL_HOURS", "0"))
+
+# Backend parse HTML: 'bs4' (html.parser như cũ) hoặc 'lxml' (selector biên dịch sẵn, nhanh hơn).
+# lxml dựng cây khác html.parser với HTML lồng thẻ sai -> chỉ bật sau khi bench_parser.py khớp trên corpus
+CRAWL_PARSER_BACKEND = os.getenv("CRAWL_PARSER_BACKEND", "bs4")
+
+# Pipeline tải/parse: số tiến trình parser (mặc định = số core) và số trang chờ parse tối đa
+CRAWL_PARSE_WORKERS = int(os.getenv("CRAWL_PARSE_WORKERS", "0")) or None
+CRAWL_PIPELINE_MAX_PENDING = int(os.getenv("CRAWL_PIPELINE_MAX_PENDING", "64"))
+
+# Ghi CSV dạng stream: flush sau N dòng, xoay file theo dung lượng, tùy chọn nén gzip
+CRAWL_CSV_FLUSH_ROWS = int(os.getenv("CRAWL_CSV_FLUSH_ROWS", "200"))
+CRAWL_CSV_MAX_MB = int(os.getenv("CRAWL_CSV_MAX_MB", "50"))
+CRAWL_CSV_GZIP = os.getenv("CRAWL_CSV_GZIP", "0") == "1"
+
+# Job chưa lấy được run_id khi xong (SP_Start_Log bận do stage khác đang chạy): thử lại N lần, cách nhau M giây
+CRAWL_START_LOG_RETRIES = int(os.getenv("CRAWL_START_LOG_RETRIES", "5"))
+CRAWL_START_LOG_RETRY_SECONDS = float(os.getenv("CRAWL_START_LOG_RETRY_SECONDS", "60"))
+
+# Giới hạn tốc độ theo domain (request/giây), tự điều chỉnh theo latency và 429/5xx
+CRAWL_RATE_INITIAL = float(os.getenv("CRAWL_RATE_INITIAL", "2"))
+CRAWL_RATE_MIN = float(os.getenv("CRAWL_RATE_MIN", "0.2"))
+CRAWL_RATE_MAX = float(os.getenv("CRAWL_RATE_MAX", "10"))
+
+# Chặn quảng cáo / tracking / video / font ở tầng mạng (Chrome DevTools)
+CRAWL_BLOCK_RESOURCES = os.getenv("CRAWL_BLOCK_RESOURCES", "1") == "1"
+
+# Ghi lại trang đã tải vào kho (file .db) / tải trang từ replay server thay cho site thật
+CRAWL_RECORD_ARCHIVE = os.getenv("CRAWL_RECORD_ARCHIVE", "")
+CRAWL_REPLAY_URL = os.getenv("CRAWL_REPLAY_URL", "")
+
+# Chờ trang theo selector của từng nguồn (thống kê dùng chung cho cả lượt crawl)
+page_waiter = PageWaiter()
+resource_blocker = ResourceBlocker() if CRAWL_BLOCK_RESOURCES else None
+page_archive = PageArchive(CRAWL_RECORD_ARCHIVE) if CRAWL_RECORD_ARCHIVE else None
+replay_url = make_url_rewriter(CRAWL_REPLAY_URL) if CRAWL_REPLAY_URL else None
 
 
 SELECTOR_LOOKUP = {
     'VnExpress': {
+        'fetch_mode': 'static',
         'selectors': {
             'article_link': 'h3.title-news a',
             'tieu_de': 'h1.title-detail',
@@ -22,9 +85,19 @@ SELECTOR_LOOKUP = {
             'ngay_xuat_ban': 'span.date',
             'ten_tac_gia': 'p.Normal strong',
             'tags': 'div.tags h4.item-tag a'
+        },
+        'block': {
+            'deny': ['*eclick.vn*'],
+            'allow': []
+        },
+        'wait': {
+            'listing': ['article_link'],
+            'article': ['tieu_de', 'content_raw'],
+            'timeout': 10
         }
     },
     'TuoiTre': {
+        'fetch_mode': 'static',
         'selectors': {
             'article_link': 'h3.box-title-text a',
             'tieu_de': 'h1.article-title',
@@ -33,6 +106,11 @@ SELECTOR_LOOKUP = {
             'ngay_xuat_ban': 'div.detail-time',
             'ten_tac_gia': 'div.author-info a.name',
             'tags': 'div.detail-tab a'
+        },
+        'wait': {
+            'listing': ['article_link'],
+            'article': ['tieu_de', 'content_raw'],
+            'timeout': 10
         }
     },
 }
@@ -59,6 +137,9 @@ def create_selenium_driver():
         "profile.managed_default_content_settings.cookies": 2      
     }
     chrome_options.add_experimental_option("prefs", prefs)
+    if CRAWL_BLOCK_RESOURCES:
+        # Bật performance log để đếm request bị chặn
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
     driver = webdriver.Chrome(options=chrome_options)
     driver.set_page_load_timeout(30)
@@ -66,20 +147,6 @@ def create_selenium_driver():
 
     return driver
 
-def safe_extract(soup, selector, default='N/A'):
-    try:
-        elements = soup.select(selector)
-        
-        if len(elements) > 1:
-            text_list = [el.get_text(strip=True) for el in elements]
-            return "\n".join(text_list)
-        elif len(elements) == 1:
-            return elements[0].get_text(strip=True)
-        else:
-            return default
-    except:
-        return default
-
 def normalize_url(url, base_url):
     if url.startswith("http"): return url
     if url.startswith("//"): return "https:" + url
@@ -91,9 +158,7 @@ def get_jobs_from_config(conn):
         cursor = conn.cursor(dictionary=True)
         query = """
             SELECT 
-                c.config_id,
-                c.source_name,
-                c.base_url,
+                c.*,
                 cat.category_name,
                 cat.category_url
             FROM config_table c
@@ -115,145 +180,381 @@ def get_jobs_from_config(conn):
                 'config_id': row['config_id'],
                 'source_name_raw': row['source_name'],
                 'base_url': row['base_url'],
+                'domain': url_domain(row['base_url']),
                 'start_url': row['category_url'],
                 'category_raw': row['category_name'],
-                'selectors': selectors['selectors']
+                'selectors': selectors['selectors'],
+                'wait': selectors.get('wait', {}),
+                'block': selectors.get('block', {}),
+                # config_table.fetch_mode (nếu có) ghi đè cấu hình mặc định của nguồn
+                'fetch_mode': row.get('fetch_mode') or selectors.get('fetch_mode', 'selenium')
             })
         return job_list
     except Exception as e:
         print(f"[ERROR] Lỗi lấy danh sách Job: {e}")
         return []
 
-def parse_article(driver, url, config, run_id):
-    s = config['selectors']
+def open_page(driver, url):
+    """driver.get() theo URL gốc (đổi sang replay server nếu đang chạy replay)."""
+    driver.get(replay_url(url) if replay_url else url)
+
+def record_page(url, html):
+    if page_archive is not None:
+        page_archive.record(url, html)
+
+def is_page_ready(html, job, page_type):
+    """Kiểm tra HTML tĩnh đã chứa đủ các selector mà parser cần hay chưa."""
+    if not html:
+        return False
+    keys = job.get('wait', {}).get(page_type, [])
+    return has_selectors(html, job['source_name_raw'], job, keys, CRAWL_PARSER_BACKEND)
+
+def build_article_record(url, fields, config, run_id):
+    return {
+        'article_url': url,
+        'source_name_raw': config['source_name_raw'],
+        'category_raw': config['category_raw'],
+        'author_raw': fields['author_raw'],
+        'published_at_raw': fields['published_at_raw'],
+        'title_raw': fields['title_raw'],
+        'summary_raw': fields['summary_raw'],
+        'content_raw': fields['content_raw'],
+        'tags_raw': fields['tags_raw'],
+        'scraped_at': datetime.now(),
+        'run_id': run_id
+    }
+
+def fetch_article_html(driver, url, config):
+    """Tải bài viết bằng Selenium, trả về HTML thô để tiến trình parser xử lý."""
     try:
-        driver.get(url)
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        
-        tags = "N/A"
-        tag_els = soup.select(s['tags'])
-        if tag_els:
-            tags = ", ".join([t.get_text(strip=True) for t in tag_els])
-
-        return {
-            'article_url': url,
-            'source_name_raw': config['source_name_raw'],
-            'category_raw': config['category_raw'],
-            'author_raw': safe_extract(soup, s['ten_tac_gia']),
-            'published_at_raw': safe_extract(soup, s['ngay_xuat_ban']),
-            'title_raw': safe_extract(soup, s['tieu_de']),
-            'summary_raw': safe_extract(soup, s['summary']),
-            'content_raw': safe_extract(soup, s['content_raw']),
-            'tags_raw': tags,
-            'scraped_at': datetime.now(),
-            'run_id': run_id
-        }
+        if resource_blocker: resource_blocker.apply(driver, config)
+        open_page(driver, url)
+        page_waiter.wait(driver, config, 'article')
+        if resource_blocker: resource_blocker.collect(driver, config)
+        html = driver.page_source
+        record_page(url, html)
+        return html
     except Exception as e:
         print(f"  [Lỗi bài viết] {url}: {e}")
         return None
 
-def run_crawler_for_job(driver, job, run_id):
-    print(f" -> Đang crawl: {job['source_name_raw']} - {job['category_raw']}")
-    crawled_data = []
-    
-    try:
-        driver.get(job['start_url'])
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        
-        links = soup.select(job['selectors']['article_link'])
-        print(f"    Tìm thấy {len(links)} bài viết.")
-
-        for link in links: 
-            href = link.get('href')
-            if not href: continue
-            
-            url = normalize_url(href, job['base_url'])
-            data = parse_article(driver, url, job, run_id)
-            if data:
-                crawled_data.append(data)
-                
-        return crawled_data, None 
-        
-    except Exception as e:
-        return [], str(e)
+def extract_article_links(html, job):
+    urls = []
+    for href in extract_links(html, job['source_name_raw'], job, CRAWL_PARSER_BACKEND):
+        if not href: continue
+        urls.append(normalize_url(href, job['base_url']))
+    return urls
 
-def save_data_to_csv(data):
-    try:
-        output_dir = os.path.join("source")
-        os.makedirs(output_dir, exist_ok=True)
+def fetch_article_links(driver, job):
+    if resource_blocker: resource_blocker.apply(driver, job)
+    open_page(driver, job['start_url'])
+    page_waiter.wait(driver, job, 'listing')
+    if resource_blocker: resource_blocker.collect(driver, job)
+    html = driver.page_source
+    record_page(job['start_url'], html)
+    return extract_article_links(html, job)
 
-        date_str = datetime.now().strftime("%d%m%y")       
-        filename = f"article_{date_str}.csv"      
-        full_path = os.path.join(output_dir, filename)  
+def collect_article_urls(pool, job, fetcher=None, limiter=None):
+    """Lấy danh sách link bài viết từ trang chuyên mục (tải tĩnh trước, Selenium nếu không đạt)."""
+    domain = job['domain']
+    if fetcher is not None and job.get('fetch_mode') == 'static':
+        if limiter: limiter.acquire(domain)
+        on_response = (lambda status, latency: limiter.report(domain, latency, status)) if limiter else None
+        html = fetcher.submit(job['start_url'], on_response).result()
+        if is_page_ready(html, job, 'listing'):
+            return extract_article_links(html, job)
+    if limiter: limiter.acquire(domain)
+    return pool.submit(fetch_article_links, job).result()
 
-        df = pd.DataFrame(data)
-        df.to_csv(full_path, index=False, encoding='utf-8-sig')
-        return full_path
-    except Exception as e:
-        raise Exception(f"Lỗi khi lưu file CSV: {str(e)}")
+def interleave_by_domain(jobs):
+    """Thứ tự chỉ số job xen kẽ giữa các domain: A1, B1, A2, B2, ..."""
+    by_domain = {}
+    for i, job in enumerate(jobs):
+        by_domain.setdefault(job['domain'], []).append(i)
+    order = []
+    for group in zip_longest(*by_domain.values()):
+        order.extend(i for i in group if i is not None)
+    return order
 
-def run_all_crawl():
-    run_id = str(uuid.uuid4())
-    
-    # 1. Kết nối tới DB
-    conn = connect_to_db("news_control_db")
-    if not conn:
-        print("[ERROR] Không kết nối được DB. Dừng.")
-        return
+def select_job_urls(job, urls, seen_index=None, checkpoint=None):
+    """Lọc các URL job cần crawl: bỏ bài đã lưu trong lượt đang chạy tiếp và bài đã crawl trước đó."""
+    if checkpoint is not None:
+        urls = [url for url in urls if not checkpoint.is_url_processed(url)]
+    if seen_index is not None:
+        new_urls = [url for url in urls if seen_index.should_crawl(url)]
+        print(f" -> {job['source_name_raw']} - {job['category_raw']}: "
+              f"bỏ qua {len(urls) - len(new_urls)} bài đã crawl, còn {len(new_urls)} bài mới.")
+        urls = new_urls
+    return urls
+
+def crawl_job_name(job):
+    """Tên job crawl trong log / khóa job."""
+    return f"crawl: {job['source_name_raw']}"
+
+def build_job_records(job, results, run_id, frontier=None):
+    """Dựng các dòng dữ liệu của job từ kết quả parse, gắn mọi category đã link tới bài viết."""
+    crawled_data = []
+    for url, fields in results:
+        data = build_article_record(url, fields, job, run_id)
+        categories = frontier.categories_for(url) if frontier else []
+        data['categories_raw'] = ", ".join(categories or [job['category_raw']])
+        crawled_data.append(data)
+    return crawled_data
+
+def run_all_crawl(resume=False, jobs=None, output_dir="source"):
+    """
+    Chạy 1 lượt crawl. Truyền sẵn `jobs` (vd: từ kho trang khi benchmark) để chạy offline:
+    không đọc config từ DB, không ghi log control, không dùng seen index.
+    Trả về thống kê lượt chạy (số bài, số dòng, thời gian parse).
+    """
+    offline = jobs is not None
+    # 0. Chạy tiếp lượt crawl dang dở gần nhất (--resume) hoặc tạo lượt mới
+    checkpoint_dir = os.path.join(output_dir, "checkpoint") if offline else DEFAULT_CHECKPOINT_DIR
+    checkpoint = CrawlCheckpoint.latest_unfinished(checkpoint_dir) if resume else None
+    if checkpoint:
+        run_id = checkpoint.run_id
+        print(f"[RESUME] Chạy tiếp lượt {run_id}: {len(checkpoint.done_jobs)} job đã xong, "
+              f"{len(checkpoint.processed_urls)} bài đã lưu.")
+    else:
+        run_id = str(uuid.uuid4())
     
-    # 2. Lấy danh sách các Job trong config
-    jobs = get_jobs_from_config(conn)
+    # 1. Kết nối tới DB (chạy offline thì ghi log ra màn hình thay cho bảng log)
+    conn = None
+    start_log, end_log = log_start, log_end
+    if offline:
+        start_log = lambda job_name, config_id: (run_id, None)
+        end_log = lambda run_id_end, status, extracted, loaded, message=None: None
+    else:
+        conn = connect_to_db("news_control_db")
+        if not conn:
+            print("[ERROR] Không kết nối được DB. Dừng.")
+            return
+
+        # 2. Lấy danh sách các Job trong config
+        jobs = get_jobs_from_config(conn)
+        if page_archive is not None:
+            page_archive.save_jobs(jobs)
     
     # 2.1. Duyệt xem danh sách các Job còn trống không ?
     if not jobs:
+        if offline:
+            print("[ERROR] Không có job nào để chạy.")
+            return
         run_id_sys, _ = log_start("SYSTEM_CHECK", -1)
         log_end(run_id_sys, "FAILED", 0, 0, "There are no jobs to run (Check Active=1)")
         conn.close()
         return
 
-    # 3. Khởi tạo driver
-    driver = create_selenium_driver()
+    # 3. Khởi tạo pool driver
+    pool = DriverPool(
+        create_selenium_driver,
+        size=CRAWL_POOL_SIZE,
+        max_pages=CRAWL_DRIVER_MAX_PAGES,
+        max_memory_mb=CRAWL_DRIVER_MAX_MEMORY_MB,
+        on_quit=resource_blocker.forget if resource_blocker else None
+    )
+    fetcher = StaticFetcher(
+        per_host_limit=CRAWL_STATIC_PER_HOST,
+        url_rewriter=replay_url,
+        recorder=record_page if page_archive is not None else None
+    ) if CRAWL_STATIC_ENABLED else None
+    limiter = AdaptiveRateLimiter(
+        initial_rate=CRAWL_RATE_INITIAL,
+        min_rate=CRAWL_RATE_MIN,
+        max_rate=CRAWL_RATE_MAX
+    )
+    pipeline = CrawlPipeline(
+        pool, fetch_article_html, fetcher, limiter,
+        parse_workers=CRAWL_PARSE_WORKERS,
+        max_pending=CRAWL_PIPELINE_MAX_PENDING,
+        backend=CRAWL_PARSER_BACKEND
+    )
+    seen_index = None
+    if CRAWL_SKIP_SEEN and not offline:
+        seen_index = SeenUrlIndex(recrawl_hours=CRAWL_RECRAWL_HOURS)
+        seen_index.seed_from_db(connect_to_db)
 
-    all_data = []
-    # 4. Vòng lặp qua từng Job 
-    for job in jobs:
-        config_id = job['config_id']
-        job_name = f"crawl: {job['source_name_raw']}"
-        
-        # 4.1. Ghi log bắt đầu
-        run_id_start, _ = log_start(job_name, config_id)
-        
-        # 4.2. Thực thi crawl dữ liệu theo từng job
-        data, error = run_crawler_for_job(driver, job, run_id_start)
-        
-        if error:
-            # 4.3a. Ghi log "FAILED" do bị lỗi
-            log_end(run_id_start, "FAILED", 0, 0, error)
-            print(error)
-            
-        elif not data:
-            log_end(run_id_start, "SUCCESS", 0, 0, "No article found")
-
-        else: 
-            # 4.3b. Lưu file CSV (cho từng job)
-            all_data.extend(data)
-            # 4.4. Ghi log SUCCESS
-            log_end(run_id_start, "SUCCESS", len(data), len(all_data))
-            print(f"  [BUFFER] Đã lấy được {len(data)} bài. Đang chờ lưu...")
-
-    if all_data: 
+    writer = StreamingCsvWriter(
+        output_dir=output_dir,
+        flush_rows=CRAWL_CSV_FLUSH_ROWS,
+        max_bytes=CRAWL_CSV_MAX_MB * 1024 * 1024,
+        compress=CRAWL_CSV_GZIP,
+        prefix=checkpoint.csv_prefix if checkpoint else None
+    )
+    if not checkpoint:
+        checkpoint = CrawlCheckpoint(run_id, writer.prefix, checkpoint_dir)
+    writer.on_flush = checkpoint.mark_rows
+
+    # 3.1. Lấy khóa từng job trước khi crawl: job đang chạy ở nơi khác bị bỏ qua ngay,
+    #      không tải trang / tốn lượt giới hạn tốc độ cho dữ liệu rồi cũng bị bỏ
+    locked_out = set()
+    crawl_started = time.monotonic()
+    if not offline:
+        for i, job in enumerate(jobs):
+            if not checkpoint.is_job_done(job) and not reserve_job(crawl_job_name(job), job['config_id']):
+                locked_out.add(i)
+                print(f" -> Bỏ qua (job đang chạy ở nơi khác): {job['source_name_raw']} - {job['category_raw']}")
+
+    # 4. Gom link của tất cả Job vào frontier chung (mỗi URL chỉ crawl 1 lần / lượt)
+    #    Trang chuyên mục được lấy xen kẽ theo domain để không dồn request vào một nguồn
+    metrics = RunMetrics(run_id, "crawl")
+    frontier = CrawlFrontier()
+    link_errors = {}
+    with metrics.stage("collect_links") as st:
+        for i in interleave_by_domain(jobs):
+            job = jobs[i]
+            if checkpoint.is_job_done(job) or i in locked_out:
+                continue
             try:
-                saved_path = save_data_to_csv(all_data)
-                print(f"  [SAVED] Đã lưu {len(all_data)} dòng vào: {saved_path}")
-            except Exception as e: 
-                log_end(run_id_start, "FAILED", 0, 0, error)
+                for url in collect_article_urls(pool, job, fetcher, limiter):
+                    frontier.add(i, url, job['category_raw'])
+            except Exception as e:
+                link_errors[i] = str(e)
+        st.rows = len(frontier.owner)
+    print(f"[FRONTIER] {len(frontier.owner)} bài viết duy nhất từ {len(jobs)} chuyên mục.")
+
+    # 5. Chuẩn bị danh sách URL cần crawl của từng Job
+    job_urls = {}
+    for i, job in enumerate(jobs):
+        if checkpoint.is_job_done(job):
+            print(f" -> Bỏ qua (đã xong ở lần chạy trước): {job['source_name_raw']} - {job['category_raw']}")
+            continue
+        if i in locked_out:
+            continue
+        job_urls[i] = None if i in link_errors else select_job_urls(
+            job, frontier.owned_urls(i), seen_index, checkpoint)
+
+    results = {i: [] for i in job_urls}
+    remaining = {i: len(urls or []) for i, urls in job_urls.items()}
 
-    # 5. Thoát Driver
-    driver.quit()
-    conn.close()
+    waiting_log = set()
+    unlogged = []
+
+    # 5.1. Job xong (đã xử lý hết URL) -> ghi log, ghi CSV, ghi checkpoint
+    #      force=True: hết lượt thử lấy run_id -> vẫn ghi CSV và checkpoint, chỉ thiếu log
+    def finish_job(i, force=False):
+        job = jobs[i]
+        config_id = job['config_id']
+        job_name = crawl_job_name(job)
+        # Log START/END ghi liền nhau khi job xong -> đưa thời gian job giữ khóa vào nội dung log
+        summary = f"{frontier.job_summary(i)}, {time.monotonic() - crawl_started:.0f}s từ lúc lấy khóa"
+
+        # 5.1.1. Ghi log bắt đầu
+        run_id_start, _ = start_log(job_name, config_id)
+        job_end_log = end_log
+        if run_id_start is None:
+            if not force:
+                # 5.1.1a. Không lấy được run_id (SP bận vì stage khác chưa End / lỗi Control DB):
+                #         giữ nguyên dữ liệu đã crawl, thử lại sau khi crawl xong (5.4)
+                waiting_log.add(i)
+                print(f"  [CHỜ LOG] {job['source_name_raw']} - {job['category_raw']}: chưa lấy được run_id, "
+                      f"giữ {len(results[i])} bài để thử lại.")
+                return
+            # 5.1.1b. Hết lượt thử: vẫn lưu dữ liệu (staging gắn run_id của lượt nạp), không ghi được log
+            job_end_log = lambda *args: None
+            unlogged.append(f"{job['source_name_raw']} - {job['category_raw']}")
+            print(f"  [LỖI LOG] {job['source_name_raw']} - {job['category_raw']}: không lấy được run_id sau "
+                  f"{CRAWL_START_LOG_RETRIES} lần thử, lưu dữ liệu nhưng không có log START/END.")
+        waiting_log.discard(i)
+
+        if job_urls[i] is None:
+            # 5.1.2a. Ghi log "FAILED" do lỗi lấy link trang chuyên mục
+            job_end_log(run_id_start, "FAILED", 0, 0, link_errors[i])
+            print(link_errors[i])
+            return
+
+        try:
+            data = build_job_records(job, results.pop(i), run_id_start, frontier)
+            if not data:
+                job_end_log(run_id_start, "SUCCESS", 0, 0, f"No article found ({summary})")
+            else:
+                # 5.1.2b. Ghi ngay ra file CSV (flush sau mỗi job)
+                writer.write_rows(data)
+                writer.flush()
+                if seen_index is not None:
+                    seen_index.add_many([d['article_url'] for d in data])
+                # 5.1.3. Ghi log SUCCESS kèm số link trùng / duy nhất của job
+                job_end_log(run_id_start, "SUCCESS", len(data), writer.total_rows, summary)
+                print(f"  [SAVED] {job['source_name_raw']} - {job['category_raw']}: "
+                      f"{len(data)} bài ({summary}) -> {writer.parts[-1]}")
+        except Exception as e:
+            job_end_log(run_id_start, "FAILED", 0, 0, str(e))
+            print(e)
+            return
+
+        # 5.1.4. Job chạy xong (không lỗi, dữ liệu đã flush xuống CSV) -> ghi checkpoint ngay,
+        #        lần --resume sau sẽ bỏ qua
+        checkpoint.mark_job_done(job)
+
+    def on_result(i, url, fields):
+        if fields:
+            results[i].append((url, fields))
+        remaining[i] -= 1
+        if remaining[i] == 0:
+            finish_job(i)
+
+    # 5.2. Job không còn URL cần crawl (hoặc lỗi lấy link) -> kết thúc ngay
+    for i in list(job_urls):
+        if remaining[i] == 0:
+            finish_job(i)
+
+    # 5.3. Crawl xen kẽ URL của mọi nguồn qua pipeline (giới hạn tốc độ theo domain)
+    items = [(i, jobs[i], url) for i, urls in job_urls.items() if urls for url in urls]
+    print(f"[CRAWL] Bắt đầu tải {len(items)} bài viết.")
+    with metrics.stage("fetch_parse") as st:
+        pipeline.run(items, on_result)
+
+        # 5.4. Job chưa lấy được run_id -> chờ stage khác End rồi thử lại, không bỏ dữ liệu đã crawl
+        for _ in range(CRAWL_START_LOG_RETRIES):
+            if not waiting_log:
+                break
+            print(f"[LOG] {len(waiting_log)} job chưa có run_id, thử lại sau {CRAWL_START_LOG_RETRY_SECONDS:.0f}s.")
+            time.sleep(CRAWL_START_LOG_RETRY_SECONDS)
+            for i in sorted(waiting_log):
+                finish_job(i)
+        for i in sorted(waiting_log):
+            finish_job(i, force=True)
+        parts = writer.close()
+        st.rows = len(items)
+        st.bytes_written = sum(os.path.getsize(p) for p in parts)
+    if pipeline.fallback_count:
+        print(f"[FALLBACK] {pipeline.fallback_count} bài chuyển sang Selenium.")
+
+    print(f"[SAVED] Tổng cộng {writer.total_rows} dòng trong {len(parts)} file.")
+    if unlogged:
+        print(f"[LỖI LOG] {len(unlogged)} job đã lưu dữ liệu nhưng không ghi được log: {', '.join(unlogged)}")
+    checkpoint.mark_finished()
+    checkpoint.close()
+
+    # 6. Thoát toàn bộ driver trong pool và các tiến trình parser
+    pipeline.close()
+    pool.close()
+    if fetcher: fetcher.close()
+    if seen_index: seen_index.close()
+    page_waiter.print_stats()
+    limiter.print_stats()
+    if resource_blocker: resource_blocker.print_stats()
+    if page_archive is not None:
+        archived = page_archive.summary()
+        print(f"[ARCHIVE] {archived['pages']} trang trong {page_archive.path} "
+              f"({archived['packed_bytes'] / 1024 / 1024:.1f} MB nén / {archived['raw_bytes'] / 1024 / 1024:.1f} MB gốc).")
+    if conn:
+        metrics.save()
+        conn.close()
+        print_pool_stats()
+
+    return {
+        'pages': len(items),
+        'rows': writer.total_rows,
+        'parsed_pages': pipeline.parsed_pages,
+        'parse_seconds': pipeline.parse_seconds,
+        'fallback': pipeline.fallback_count,
+        'unlogged_jobs': unlogged
+    }
 
 if __name__ == "__main__":
-    run_all_crawl()
+    parser = argparse.ArgumentParser(description="Crawl bài viết theo config_table")
+    parser.add_argument("--resume", action="store_true", help="Chạy tiếp lượt crawl dang dở gần nhất")
+    args = parser.parse_args()
+    run_all_crawl(resume=args.resume)
 
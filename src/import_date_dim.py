@@ -1,8 +1,8 @@
-import pandas as pd
 import mysql.connector
 from dotenv import load_dotenv
 import os
-from utils.db_utils import connect_to_db
+from utils.db_utils import connect_for_bulk_load
+from utils.bulk_loader import load_csv
 
 def import_date_dim():
     csv_file = "date_dim.csv"
@@ -11,11 +11,7 @@ def import_date_dim():
         print(f"Không tìm thấy file {csv_file}")
         return
 
-    print("Đang đọc file CSV...")
-    # Đọc file 
-    df = pd.read_csv(csv_file, header=None)
-    
-    # Chọn đúng các cột cần thiết dựa trên dữ liệu thực tế:
+    # Chọn đúng các cột cần thiết dựa trên dữ liệu thực tế (vị trí cột -> cột DimDate):
     # Cột 0: date_key (1)
     # Cột 1: full_date (2005-01-01)
     # Cột 4: day_of_week (Saturday)
@@ -24,15 +20,12 @@ def import_date_dim():
     # Cột 8: day_of_month (1)
     # Cột 18: holiday (Non-Holiday)
     # Cột 19: day_type (Weekend)
-    
-    df_filtered = df.iloc[:, [0, 1, 4, 5, 6, 8, 18, 19]]
-    
-    # Convert NaN thành None để tránh lỗi DB
-    df_filtered = df_filtered.where(pd.notnull(df_filtered), None)
-    
-    print(f"Tìm thấy {len(df_filtered)} dòng dữ liệu.")
+    columns = {
+        0: "date_key", 1: "full_date", 4: "day_of_week", 5: "month_name",
+        6: "year", 8: "day_of_month", 18: "holiday", 19: "day_type"
+    }
 
-    conn = connect_to_db("news_warehouse_db")
+    conn = connect_for_bulk_load("news_warehouse_db")
     if conn is None:
         return
 
@@ -45,21 +38,12 @@ def import_date_dim():
         cursor.execute("TRUNCATE TABLE DimDate;")
         cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
         
-        # 2. Import dữ liệu mới
+        # 2. Import dữ liệu mới (LOAD DATA / INSERT theo lô), ô trống -> NULL để tránh lỗi DB
         print("Đang nạp dữ liệu vào Database...")
-        sql = """
-        INSERT INTO DimDate 
-        (date_key, full_date, day_of_week, month_name, year, day_of_month, holiday, day_type)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        # Chuyển đổi sang list tuple để insert nhanh
-        values = [tuple(x) for x in df_filtered.to_numpy()]
-        
-        cursor.executemany(sql, values)
+        rows, method = load_csv(conn, "DimDate", csv_file, columns, skip_header=False, empty_as_null=True)
         conn.commit()
         
-        print(f"THÀNH CÔNG! Đã import {cursor.rowcount} dòng vào bảng DimDate.")
+        print(f"THÀNH CÔNG! Đã import {rows} dòng vào bảng DimDate ({method}).")
         
     except mysql.connector.Error as err:
         print(f"Lỗi Import: {err}")
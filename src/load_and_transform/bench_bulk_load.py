@@ -0,0 +1,110 @@
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.utils.db_utils import connect_for_bulk_load
+from src.utils.bulk_loader import BULK_TEMP_DIR, load_csv, open_text
+
+# =============================================
+# BENCHMARK BULK LOAD
+# Mục đích: So sánh tốc độ nạp CSV vào MySQL (dòng/giây) giữa
+#           executemany (cách cũ), INSERT nhiều dòng theo lô và LOAD DATA LOCAL INFILE
+# Chạy: python src/load_and_transform/bench_bulk_load.py --rows 20000
+# =============================================
+
+BENCH_TABLE = "bench_bulk_load"
+COLUMNS = ["article_url", "source_name", "category", "author", "published_at",
+           "title", "summary", "content", "scraped_at", "tags"]
+
+def make_csv(path, rows):
+    """Sinh file CSV bài báo giả (cùng cột với staging_temp_table)."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            writer.writerow([
+                f"https://vnexpress.net/bai-viet-{i}.html", "VnExpress", "Thời sự", "Nguyễn Văn A",
+                "Thứ hai, 1/1/2024, 08:00 (GMT+7)", f"Tiêu đề bài viết số {i}",
+                "Tóm tắt \"có dấu nháy\", có dấu phẩy", "Nội dung bài viết.\nĐoạn 2. " * 20,
+                "2024-01-01 08:00:00", "tag1, tag2"
+            ])
+
+def load_executemany(conn, path):
+    """Cách cũ: đọc toàn bộ CSV vào list tuple rồi executemany."""
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        data = [tuple(row) for row in reader]
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(COLUMNS))
+    cursor.executemany(f"INSERT INTO {BENCH_TABLE} ({', '.join(COLUMNS)}) VALUES ({placeholders})", data)
+    cursor.close()
+    return len(data), "executemany"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nạp CSV vào MySQL")
+    parser.add_argument("--rows", type=int, default=20000, help="Số dòng CSV giả sinh ra")
+    parser.add_argument("--csv", help="Dùng file CSV có sẵn (cùng cột staging) thay vì sinh dữ liệu")
+    args = parser.parse_args()
+
+    # 1: Chuẩn bị file CSV
+    tmp_path = None
+    if args.csv:
+        path = args.csv
+    else:
+        # Sinh trong thư mục được phép LOAD DATA LOCAL (DB_LOCAL_INFILE_DIR)
+        os.makedirs(BULK_TEMP_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".csv", prefix="bench_bulk_", dir=BULK_TEMP_DIR)
+        os.close(fd)
+        make_csv(tmp_path, args.rows)
+        path = tmp_path
+    print(f"File: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    # 2: Bảng tạm cùng cấu trúc staging_temp_table (tự mất khi đóng kết nối)
+    conn = connect_for_bulk_load("news_staging_db")
+    if not conn:
+        return
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE TEMPORARY TABLE {BENCH_TABLE} LIKE staging_temp_table")
+
+    paths = [
+        ("executemany", lambda: load_executemany(conn, path)),
+        ("insert", lambda: load_csv(conn, BENCH_TABLE, path, COLUMNS, method="insert")),
+        ("load_data", lambda: load_csv(conn, BENCH_TABLE, path, COLUMNS, method="load_data")),
+    ]
+
+    # 3: Chạy từng cách nạp, đo dòng/giây
+    results = []
+    try:
+        for name, run in paths:
+            cursor.execute(f"TRUNCATE TABLE {BENCH_TABLE}")
+            start = time.perf_counter()
+            try:
+                rows, _ = run()
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"  {name:<12} | Lỗi: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            results.append((name, rows, elapsed))
+            print(f"  {name:<12} | {rows} dòng | {elapsed:.2f}s | {rows / elapsed if elapsed else 0:.0f} dòng/giây")
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {BENCH_TABLE}")
+        cursor.close()
+        conn.close()
+        if tmp_path:
+            os.remove(tmp_path)
+
+    # 4: Báo cáo so với cách cũ
+    base = next((r for r in results if r[0] == "executemany"), None)
+    if base and base[2]:
+        for name, rows, elapsed in results:
+            if name != "executemany" and elapsed:
+                print(f"  {name:<12} nhanh hơn executemany {base[2] / elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import csv
+import glob
+import gzip
+import time
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from src.load_and_transform import text_normalizer
+from src.load_and_transform.text_normalizer import normalize_content, legacy_clean_content, has_markup
+
+# =============================================
+# BENCHMARK TEXT NORMALIZER
+# Mục đích: Đo tốc độ (MB/s) clean_content bản gốc và bản normalizer trên nội dung bài thật,
+#           đồng thời kiểm tra 2 bản cho ra kết quả giống hệt nhau
+# Chạy: python src/load_and_transform/bench_normalizer.py --csv "source/article_*.csv*"
+#       python src/load_and_transform/bench_normalizer.py --from-staging 2000
+# =============================================
+
+csv.field_size_limit(2 ** 31 - 1)
+
+def load_corpus_csv(pattern, limit):
+    """Đọc cột content_raw từ file CSV của crawler."""
+    corpus = []
+    for path in sorted(glob.glob(pattern)):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                content = row.get("content_raw")
+                if content:
+                    corpus.append(content)
+                if limit and len(corpus) >= limit:
+                    return corpus
+    return corpus
+
+def load_corpus_staging(limit):
+    """Đọc cột content từ staging_temp_table."""
+    from src.utils.db_utils import connect_to_db
+    conn = connect_to_db("news_staging_db")
+    if not conn:
+        return []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT content FROM staging_temp_table WHERE content IS NOT NULL LIMIT %s", (limit,))
+        corpus = [row[0] for row in cursor.fetchall() if row[0]]
+        cursor.close()
+        return corpus
+    finally:
+        conn.close()
+
+def run(func, corpus, repeat):
+    """Chạy func trên cả corpus `repeat` lần, trả về (kết quả lần cuối, thời gian tốt nhất)."""
+    best = None
+    outputs = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = [func(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return outputs, best
+
+class _NoTokenizer:
+    @staticmethod
+    def tokenize(text):
+        return text
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_content: bản gốc vs text_normalizer")
+    parser.add_argument("--csv", default="source/article_*.csv*", help="Glob file CSV của crawler")
+    parser.add_argument("--from-staging", type=int, metavar="N", help="Lấy N bài từ staging_temp_table thay vì CSV")
+    parser.add_argument("--limit", type=int, default=0, help="Số bài tối đa đọc từ CSV (0 = tất cả)")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần chạy, lấy thời gian tốt nhất")
+    parser.add_argument("--skip-tokenizer", action="store_true",
+                        help="Bỏ pyvi (cả 2 bản) để đo riêng phần làm sạch HTML / regex")
+    args = parser.parse_args()
+
+    # 1: Nạp corpus bài thật
+    corpus = load_corpus_staging(args.from_staging) if args.from_staging else load_corpus_csv(args.csv, args.limit)
+    if not corpus:
+        print("Không có nội dung bài nào để benchmark.")
+        return
+    size_mb = sum(len(text.encode("utf-8")) for text in corpus) / 1024 / 1024
+    plain = sum(1 for text in corpus if not has_markup(text))
+    print(f"Corpus: {len(corpus)} bài | {size_mb:.1f} MB | {plain} bài text thuần (fast path, bỏ qua parse HTML)")
+
+    if args.skip_tokenizer:
+        text_normalizer.ViTokenizer = _NoTokenizer
+    else:
+        text_normalizer.ViTokenizer.tokenize("khởi động")
+
+    # 2: Đo từng bản
+    results = {}
+    for name, func in (("legacy", legacy_clean_content), ("normalizer", normalize_content)):
+        outputs, elapsed = run(func, corpus, args.repeat)
+        results[name] = outputs
+        print(f"  {name:<11} | {elapsed:.2f}s | {size_mb / elapsed if elapsed else 0:.2f} MB/s | "
+              f"{len(corpus) / elapsed if elapsed else 0:.1f} bài/giây")
+
+    # 3: Kiểm tra kết quả giống nhau
+    mismatches = [i for i, (a, b) in enumerate(zip(results["legacy"], results["normalizer"])) if a != b]
+    if mismatches:
+        i = mismatches[0]
+        print(f"[LỖI] {len(mismatches)} bài khác kết quả. Bài đầu tiên #{i}:")
+        print(f"  legacy    : {results['legacy'][i][:200]!r}")
+        print(f"  normalizer: {results['normalizer'][i][:200]!r}")
+        sys.exit(1)
+    print(f"[OK] Kết quả giống hệt nhau trên {len(corpus)} bài.")
+
+if __name__ == "__main__":
+    main()
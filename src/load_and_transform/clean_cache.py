@@ -0,0 +1,95 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+
+
+def cache_key(raw, version):
+    """Khóa cache: SHA-256 của phiên bản bộ clean + nội dung thô."""
+    return hashlib.sha256(f"{version}\0{raw or ''}".encode("utf-8")).hexdigest()
+
+
+# =============================================
+# CLEAN CACHE
+# Mục đích: Lưu kết quả clean_content (nén zlib, khóa theo hash nội dung thô + phiên bản bộ clean)
+#           để bài chưa đổi nội dung không phải clean/tách từ lại ở lần transform sau
+# =============================================
+class CleanCache:
+    """
+    Cache dạng 1 file SQLite: bảng entries (key -> nội dung đã clean nén).
+    Tổng dung lượng vượt `max_bytes` thì xóa các mục lâu không dùng nhất (LRU) còn ~90%.
+    Chỉ dùng trong tiến trình chính (tiến trình con của pool không đọc/ghi cache).
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON entries (last_used)")
+        self.db.commit()
+
+    def get_many(self, keys):
+        """Trả về {key: nội dung đã clean} cho các key có trong cache, cập nhật last_used."""
+        found = {}
+        unique = list(set(keys))
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            placeholders = ", ".join(["?"] * len(part))
+            for key, value in self.db.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", part):
+                found[key] = zlib.decompress(value).decode("utf-8")
+        if found:
+            now = time.time()
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            self.db.commit()
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items):
+        """Ghi {key: nội dung đã clean} vào cache rồi dọn bớt nếu vượt dung lượng."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            packed = zlib.compress(value.encode("utf-8"), 6)
+            rows.append((key, packed, len(packed), now))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+        self._evict()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = total - int(self.max_bytes * 0.9)
+        freed = removed = 0
+        keys = []
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            keys.append(key)
+            freed += size
+            if freed >= target:
+                break
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            self.db.execute(f"DELETE FROM entries WHERE key IN ({', '.join(['?'] * len(part))})", part)
+            removed += len(part)
+        self.db.commit()
+        print(f"[CACHE] Đã xóa {removed} mục cũ ({freed / 1024 / 1024:.1f} MB) khỏi {self.path}")
+
+    def close(self):
+        self.db.close()
@@ -1,10 +1,44 @@
 import sys
 import os
-import csv
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.utils.db_utils import connect_to_db
-from src.utils.log_utils import log_start, log_end
+from src.utils.db_utils import connect_for_bulk_load, ensure_pool_capacity
+from src.utils.log_utils import log_start, log_end, log_progress
+from src.utils.metrics import RunMetrics
+from src.utils.bulk_loader import stream_csv, read_csv_header, ChunkLoadError
+from src.utils.file_manifest import FileManifest, file_sha256
+
+# Số dòng mỗi lô khi nạp staging (mỗi lô commit 1 lần)
+STAGING_CHUNK_ROWS = int(os.getenv("STAGING_CHUNK_ROWS", "5000"))
+# Lượt nạp mới ghi vào bảng _new, thành công mới hoán đổi (RENAME) thành staging_temp_table
+STAGING_TABLE = "staging_temp_table"
+STAGING_NEW_TABLE = "staging_temp_table_new"
+STAGING_PREV_TABLE = "staging_temp_table_prev"
+# Số file nạp song song (mỗi file 1 kết nối riêng lấy từ pool)
+STAGING_LOAD_WORKERS = int(os.getenv("STAGING_LOAD_WORKERS", "4"))
+# File nạp lỗi quá số lần này thì bị cách ly (bỏ qua) để không chặn các file khác (0 = không giới hạn)
+STAGING_MAX_FILE_ATTEMPTS = int(os.getenv("STAGING_MAX_FILE_ATTEMPTS", "3"))
+
+# Cột staging chứa danh sách category, tự thêm vào bảng staging cũ chưa có cột này
+STAGING_CATEGORIES_COLUMN = "categories"
+
+# Cột CSV của crawler -> cột staging_temp_table (run_id lấy theo lần load, cột khác bỏ qua)
+# categories_raw (mọi category đã link tới bài) vào cột riêng `categories`; `category` giữ category của job
+STAGING_COLUMN_MAP = {
+    "article_url": "article_url",
+    "source_name_raw": "source_name",
+    "category_raw": "category",
+    "author_raw": "author",
+    "published_at_raw": "published_at",
+    "title_raw": "title",
+    "summary_raw": "summary",
+    "content_raw": "content",
+    "scraped_at": "scraped_at",
+    "tags_raw": "tags",
+    "categories_raw": STAGING_CATEGORIES_COLUMN
+}
 
 # =============================================
 # STAGING LOADER CLASS
@@ -13,110 +47,292 @@ from src.utils.log_utils import log_start, log_end
 class StagingLoader:
     """Load CSV vào staging_temp_table, quản lý run_id tự động với logging."""
 
-    def __init__(self, staging_db="news_staging_db", job_name="Load_Staging"):
+    def __init__(self, staging_db="news_staging_db", job_name="Load_Staging", chunk_rows=STAGING_CHUNK_ROWS):
         """
         Khởi tạo StagingLoader
         """
         # 1: Kết nối database
-        self.staging_conn = connect_to_db(staging_db)
+        self.staging_conn = connect_for_bulk_load(staging_db)
         
         # 2: Tạo cursor
         self.staging_cursor = self.staging_conn.cursor()
+        self.staging_db = staging_db
         self.job_name = job_name
+        self.chunk_rows = chunk_rows
+        self.manifest = FileManifest()
+        self.batch_table = None
+        self._checked_tables = set()
+        self._rows_done = 0
+        self._progress_lock = threading.Lock()
         
         # 3: Log START và lấy run_id
         self.run_id, _ = log_start(job_name)
         print(f"[INFO] RUN_ID: {self.run_id}")
+        self.metrics = RunMetrics(self.run_id, job_name)
 
     # =============================
     # Clear staging table
-    # Mục đích: Xóa toàn bộ dữ liệu cũ trong staging_temp_table
+    # Mục đích: Tạo bảng rỗng cho lượt nạp mới (chỉ thao tác metadata, không DELETE từng dòng);
+    #           dữ liệu lượt trước vẫn đọc được tới khi lượt mới nạp xong và được hoán đổi
     # =============================
     def clear_staging_table(self):
         """
-        Xóa dữ liệu cũ trong staging_temp_table
+        Chuẩn bị staging_temp_table_new (cùng cấu trúc staging_temp_table) để nạp lượt mới
         """
-        # 4: Execute DELETE query
-        self.staging_cursor.execute("DELETE FROM staging_temp_table")
-        
-        # 5: Commit transaction
-        self.staging_conn.commit()
-        print("Đã xóa toàn bộ dữ liệu cũ trong staging_temp_table.")
+        with self.metrics.stage("clear_staging") as st:
+            # 4: Dọn bảng còn sót từ lượt lỗi trước
+            self.staging_cursor.execute(f"DROP TABLE IF EXISTS {STAGING_NEW_TABLE}")
+            self.staging_cursor.execute(f"DROP TABLE IF EXISTS {STAGING_PREV_TABLE}")
+            
+            # 5: Tạo bảng rỗng cho lượt nạp mới
+            self.staging_cursor.execute(f"CREATE TABLE {STAGING_NEW_TABLE} LIKE {STAGING_TABLE}")
+            st.rows = 0
+        self.batch_table = STAGING_NEW_TABLE
+        print(f"Đã tạo {STAGING_NEW_TABLE} cho lượt nạp mới ({STAGING_TABLE} giữ nguyên tới khi hoán đổi).")
+
+    def _has_run_id(self):
+        """Không có run_id (log_start bị từ chối) thì không nạp: dòng staging thiếu run_id
+        sẽ không bao giờ qua được watermark của transform incremental."""
+        if self.run_id is None:
+            print("[ERROR] Không có run_id (log START bị từ chối), bỏ qua lượt nạp staging.")
+            self._discard_batch()
+            return False
+        return True
+
+    def _ensure_staging_columns(self):
+        """Thêm cột categories (TEXT NULL) vào bảng đích nếu bảng được tạo trước khi có cột này."""
+        table = self.batch_table or STAGING_TABLE
+        if table in self._checked_tables:
+            return
+        self.staging_cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (STAGING_CATEGORIES_COLUMN,))
+        if not self.staging_cursor.fetchall():
+            self.staging_cursor.execute(f"ALTER TABLE {table} ADD COLUMN {STAGING_CATEGORIES_COLUMN} TEXT NULL")
+            print(f"[INFO] Đã thêm cột {STAGING_CATEGORIES_COLUMN} vào {table}.")
+        self._checked_tables.add(table)
+
+    def _publish_batch(self):
+        """Hoán đổi bảng lượt mới thành staging_temp_table (RENAME nguyên tử) rồi xóa bảng cũ."""
+        if self.batch_table is None:
+            return
+        with self.metrics.stage("swap_tables") as st:
+            self.staging_cursor.execute(
+                f"RENAME TABLE {STAGING_TABLE} TO {STAGING_PREV_TABLE}, {STAGING_NEW_TABLE} TO {STAGING_TABLE}")
+            self.staging_cursor.execute(f"DROP TABLE IF EXISTS {STAGING_PREV_TABLE}")
+            st.rows = 1
+        self.batch_table = None
+
+    def _discard_batch(self):
+        """Lượt nạp lỗi: xóa bảng lượt mới, staging_temp_table giữ dữ liệu lượt trước."""
+        if self.batch_table is None:
+            return
+        try:
+            self.staging_cursor.execute(f"DROP TABLE IF EXISTS {STAGING_NEW_TABLE}")
+            print(f"Đã hủy lượt nạp, {STAGING_TABLE} giữ nguyên dữ liệu lượt trước.")
+        except Exception as e:
+            print(f"Lỗi dọn dẹp {STAGING_NEW_TABLE}: {e}")
+        self.batch_table = None
+
+    # =============================
+    # Nạp 1 file CSV
+    # Mục đích: Stream 1 file vào bảng lượt nạp theo lô trên kết nối `conn`
+    # =============================
+    def _load_file(self, conn, path):
+        """Trả về (số dòng, cách nạp). Lỗi lô -> ChunkLoadError (các lô trước đã commit)."""
+        name = os.path.basename(path)
+        # Ánh xạ cột theo header của file
+        columns = [STAGING_COLUMN_MAP.get(col.strip()) for col in read_csv_header(path)]
+        done = 0
+
+        # Báo tiến độ (cộng dồn mọi file của run) sau mỗi lô đã commit
+        def report(chunk_no, rows_done):
+            nonlocal done
+            with self._progress_lock:
+                self._rows_done += rows_done - done
+                total = self._rows_done
+            done = rows_done
+            log_progress(self.run_id, self.job_name, total, f"{name}: lô {chunk_no}")
+
+        return stream_csv(
+            conn, self.batch_table or STAGING_TABLE, path, columns,
+            chunk_rows=self.chunk_rows, constants={"run_id": self.run_id}, on_chunk=report
+        )
 
     # =============================
     # Load CSV vào staging
-    # Mục đích: Đọc file CSV và insert vào staging_temp_table
+    # Mục đích: Đọc file CSV theo luồng và insert vào staging_temp_table theo từng lô
     # =============================
     def load_csv_to_staging(self, csv_path):
         """
-        Load dữ liệu từ CSV vào staging_temp_table
+        Load dữ liệu từ CSV (hoặc danh sách file part) vào staging_temp_table.
+        Mỗi lô `chunk_rows` dòng được commit riêng; lỗi thì báo file, lô và dòng bắt đầu của lô.
         """
+        csv_paths = csv_path if isinstance(csv_path, (list, tuple)) else [csv_path]
+        if not self._has_run_id():
+            return False
         total_rows = 0
+        current = None
         try:
+            self._ensure_staging_columns()
             # 6: Kiểm tra file tồn tại
-            if not os.path.exists(csv_path):
-                raise FileNotFoundError(f"Không tìm thấy file: {csv_path}")
-
-            # 7: Đọc dữ liệu từ CSV
-            rows = []
-            with open(csv_path, "r", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f)
-                # 7.1: Lặp qua từng row và chuẩn bị dữ liệu
-                for row in reader:
-                    rows.append((
-                        row.get("article_url", ""),
-                        row.get("source_name_raw", ""),
-                        row.get("category_raw", ""),
-                        row.get("author_raw", ""),
-                        row.get("published_at_raw", ""),
-                        row.get("title_raw", ""),
-                        row.get("summary_raw", ""),
-                        row.get("content_raw", ""),
-                        row.get("scraped_at", ""),
-                        self.run_id,
-                        row.get("tags_raw", "")
-                    ))
+            for path in csv_paths:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"Không tìm thấy file: {path}")
+
+            # 7: Nạp lần lượt từng file part theo lô (LOAD DATA, hoặc INSERT nếu LOCAL INFILE bị tắt)
+            with self.metrics.stage("load_csv") as st:
+                for path in csv_paths:
+                    current = os.path.basename(path)
+                    st.bytes_read += os.path.getsize(path)
+                    rows, method = self._load_file(self.staging_conn, path)
+                    total_rows += rows
+                    print(f"  -> {current}: {rows} dòng ({method})")
+                st.rows = total_rows
+
+            # 7.1: Hoán đổi bảng lượt mới vào staging_temp_table
+            self._publish_batch()
 
             # 7.2: Kiểm tra CSV có dữ liệu không
-            if not rows:
+            if not total_rows:
                 print("CSV không có dữ liệu.")
                 log_end(self.run_id, "SUCCESS", total_rows, total_rows)
                 return False
 
-            # 8: Insert dữ liệu vào database
-            insert_query = """
-                INSERT INTO staging_temp_table (
-                    article_url,
-                    source_name,
-                    category,
-                    author,
-                    published_at,
-                    title,
-                    summary,
-                    content,
-                    scraped_at,
-                    run_id,
-                    tags
-                ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """
-            # 8.1: Execute insert nhiều rows
-            self.staging_cursor.executemany(insert_query, rows)
-            
-            # 8.2: Commit transaction
-            self.staging_conn.commit()
-            total_rows = len(rows)
+            # 8: Các lô đã được commit trong lúc nạp
             print(f"Đã nạp {total_rows} bản ghi vào staging_temp_table với run_id {self.run_id}.")
             
             # 9: Log kết quả SUCCESS
             log_end(self.run_id, "SUCCESS", total_rows, total_rows)
             return True
 
+        except ChunkLoadError as e:
+            # 9.1: Lô lỗi đã rollback; các lô trước đó nằm trong bảng lượt mới (bị hủy)
+            total_rows += e.rows_committed
+            message = f"{current}: {e}"
+            print("Lỗi khi nạp dữ liệu vào staging_temp_table:", message)
+            kept = 0 if self.batch_table else total_rows
+            self._discard_batch()
+            log_end(self.run_id, "FAILED", total_rows, kept, message)
+            return False
+
         except Exception as e:
-            # 9.1: Rollback và log FAILED
+            # 9.2: Rollback, hủy lượt nạp và log FAILED
             self.staging_conn.rollback()
             print("Lỗi khi nạp dữ liệu vào staging_temp_table:", str(e))
+            kept = 0 if self.batch_table else total_rows
+            self._discard_batch()
+            log_end(self.run_id, "FAILED", total_rows, kept, str(e))
+            return False
+        finally:
+            self.metrics.save()
+
+    # =============================
+    # Load mọi file chưa nạp (theo manifest)
+    # Mục đích: Nạp song song các file CSV chưa có trong staging_file_manifest, bỏ qua file trùng hash
+    # =============================
+    def _load_worker(self, path):
+        """Worker: nạp 1 file trên kết nối riêng. Trả về (rows, error)."""
+        conn = connect_for_bulk_load(self.staging_db)
+        if not conn:
+            return 0, f"Không kết nối được {self.staging_db}"
+        try:
+            rows, method = self._load_file(conn, path)
+            print(f"  -> {os.path.basename(path)}: {rows} dòng ({method})")
+            return rows, None
+        except Exception as e:
+            conn.rollback()
+            rows = e.rows_committed if isinstance(e, ChunkLoadError) else 0
+            return rows, str(e)
+        finally:
+            conn.close()
+
+    def load_pending_files(self, csv_paths, workers=STAGING_LOAD_WORKERS, max_attempts=STAGING_MAX_FILE_ATTEMPTS):
+        """
+        Nạp mọi file trong csv_paths chưa được nạp thành công (so theo hash nội dung).
+        File trùng nội dung chỉ nạp 1 lần. Lượt nạp chỉ được hoán đổi vào staging_temp_table
+        (và ghi manifest SUCCESS) khi mọi file đều nạp thành công.
+        File đã lỗi `max_attempts` lần (vd: file .gz bị cắt cụt) bị cách ly để các file khác vẫn được nạp.
+        """
+        if not self._has_run_id():
+            return False
+        total_rows = 0
+        results = []
+        try:
+            self._ensure_staging_columns()
+            # 6: Hash nội dung, bỏ file trùng nhau và file đã nạp (manifest)
+            files = {}
+            for path in sorted(csv_paths):
+                content_hash = file_sha256(path)
+                if content_hash in files:
+                    print(f"  -> Bỏ qua {os.path.basename(path)}: trùng nội dung với {os.path.basename(files[content_hash][0])}")
+                    continue
+                files[content_hash] = (path, os.path.getsize(path))
+            loaded = self.manifest.loaded_hashes(files)
+            pending = [(path, size, h) for h, (path, size) in files.items() if h not in loaded]
+
+            # 6.0: Cách ly file đã lỗi quá số lần cho phép (không chặn mãi các file còn lại)
+            quarantined = []
+            if max_attempts and pending:
+                attempts = self.manifest.failed_attempts(h for _, _, h in pending)
+                quarantined = [item for item in pending if attempts.get(item[2], 0) >= max_attempts]
+                pending = [item for item in pending if attempts.get(item[2], 0) < max_attempts]
+                for path, _, content_hash in quarantined:
+                    print(f"  -> [CÁCH LY] {os.path.basename(path)}: đã lỗi {attempts[content_hash]} lần, bỏ qua "
+                          f"(xóa dòng FAILED của hash {content_hash[:12]} trong staging_file_manifest để nạp lại)")
+            print(f"Tìm thấy {len(files)} file, đã nạp trước đó {len(loaded)}, cách ly {len(quarantined)}, "
+                  f"cần nạp {len(pending)}.")
+            note = (f"Cách ly {len(quarantined)} file: " +
+                    ", ".join(os.path.basename(path) for path, _, _ in quarantined))[:1000] if quarantined else None
+
+            # 6.1: Không có file mới -> hủy bảng lượt mới (rỗng), staging_temp_table giữ lượt trước
+            if not pending:
+                self._discard_batch()
+                print("Không có file mới cần nạp.")
+                log_end(self.run_id, "SUCCESS", 0, 0, note)
+                return True
+
+            # 7: Nạp song song vào bảng lượt mới, mỗi file 1 kết nối
+            #    (pool phải đủ cho kết nối chính của loader + mọi worker, nếu không worker chờ tới timeout)
+            workers = max(1, min(workers, len(pending)))
+            ensure_pool_capacity(self.staging_db, workers + 1, bulk_load=True)
+            with self.metrics.stage("load_csv") as st:
+                st.bytes_read = sum(size for _, size, _ in pending)
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {executor.submit(self._load_worker, item[0]): item for item in pending}
+                    for future in as_completed(futures):
+                        rows, error = future.result()
+                        total_rows += rows
+                        results.append((futures[future], rows, error))
+                st.rows = total_rows
+                if any(error for _, _, error in results):
+                    st.status = "FAILED"
+
+            # 8: Có file lỗi -> hủy cả lượt (staging giữ lượt trước), các file sẽ được nạp lại lần sau;
+            #    file lỗi đủ max_attempts lần sẽ bị cách ly ở lượt sau
+            errors = [(item, rows, error) for item, rows, error in results if error]
+            if errors:
+                self._discard_batch()
+                for (path, size, content_hash), rows, error in errors:
+                    self.manifest.record(path, size, content_hash, rows, self.run_id, "FAILED", error)
+                message = "; ".join(f"{os.path.basename(item[0])}: {error}" for item, _, error in errors)
+                print("Lỗi khi nạp dữ liệu vào staging_temp_table:", message)
+                log_end(self.run_id, "FAILED", total_rows, 0, message[:1000])
+                return False
+
+            # 9: Hoán đổi lượt mới vào staging_temp_table rồi ghi manifest
+            self._publish_batch()
+            for (path, size, content_hash), rows, _ in results:
+                self.manifest.record(path, size, content_hash, rows, self.run_id)
+            print(f"Đã nạp {total_rows} bản ghi từ {len(pending)} file vào staging_temp_table với run_id {self.run_id}.")
+            log_end(self.run_id, "SUCCESS", total_rows, total_rows, note)
+            return True
+
+        except Exception as e:
+            print("Lỗi khi nạp dữ liệu vào staging_temp_table:", str(e))
+            self._discard_batch()
             log_end(self.run_id, "FAILED", total_rows, 0, str(e))
             return False
+        finally:
+            self.metrics.save()
 
     # =============================
     # Đóng kết nối
@@ -126,31 +342,30 @@ class StagingLoader:
         """
         Đóng kết nối database
         """
-        # 10: Đóng cursor
+        # 10: Lượt nạp chưa hoán đổi thì hủy, đóng cursor
+        self._discard_batch()
         self.staging_cursor.close()
         
         # 11: Đóng connection
         self.staging_conn.close()
 
 if __name__ == "__main__":
-    # 12: Tìm file CSV mới nhất trong thư mục source
-    list_of_files = glob.glob('./source/article_*.csv')
+    # 12: Tìm toàn bộ file CSV trong thư mục source
+    list_of_files = glob.glob('./source/article_*.csv') + glob.glob('./source/article_*.csv.gz')
 
     if not list_of_files:
         print("Không tìm thấy file CSV nào trong thư mục source!")
     else:
-        # 13: Lấy file mới nhất dựa trên thời gian tạo
-        latest_file = max(list_of_files, key=os.path.getctime)
-        print(f"Phát hiện file mới nhất: {latest_file}")
+        print(f"Phát hiện {len(list_of_files)} file CSV trong thư mục source.")
         
-        # 14: Khởi tạo StagingLoader
+        # 13: Khởi tạo StagingLoader
         loader = StagingLoader()
         try:
-            #  15: Xóa dữ liệu cũ
+            #  14: Xóa dữ liệu cũ
             loader.clear_staging_table()
             
-            #  16: Load CSV vào staging
-            loader.load_csv_to_staging(latest_file)
+            #  15: Load mọi file chưa nạp (theo manifest) vào staging
+            loader.load_pending_files(list_of_files)
         finally:
-            # 17: Đóng kết nối (luôn chạy dù có lỗi hay không)
+            # 16: Đóng kết nối (luôn chạy dù có lỗi hay không)
             loader.close()
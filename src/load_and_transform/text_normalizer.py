@@ -0,0 +1,121 @@
+import re
+from bs4 import BeautifulSoup
+from pyvi import ViTokenizer
+
+# =============================================
+# TEXT NORMALIZER
+# Mục đích: Làm sạch nội dung bài viết (clean_content) với pattern biên dịch sẵn 1 lần,
+#           bỏ qua bước parse HTML khi nội dung đã là text thuần (không có thẻ / entity)
+# Kết quả phải giống hệt bản gốc (legacy_*) - kiểm tra bằng bench_normalizer.py
+# =============================================
+
+# Nội dung rác của video player (xóa lần lượt từng pattern, giống bản gốc)
+BLACKLIST_PATTERNS = [
+    re.compile(r"Video Player.*?End of dialog window", re.IGNORECASE | re.DOTALL),
+    re.compile(r"This is a modal window.*?End of dialog window", re.IGNORECASE | re.DOTALL),
+]
+# Đuôi chung của các pattern blacklist: không có thì bỏ qua cả 2 regex
+_BLACKLIST_END = re.compile(r"End of dialog window", re.IGNORECASE)
+
+REMOVED_TAGS = ["script", "style", "iframe", "video", "source", "button", "noscript", "meta", "link"]
+
+# Chữ thường dính chữ hoa -> chèn khoảng trắng
+CAMEL_SPLIT = re.compile(r"([a-zàáạảãâăêôơưéèẻẽẹđỳỳỷỹ])([A-ZÀÁẠẢÃÂĂÊÔƠƯÉÈẺẼẸĐỲỶỸ])")
+
+# Ký tự thừa bị xóa ở đầu / cuối đoạn (sau khi khoảng trắng đã gộp thành 1 dấu cách)
+EDGE_CHARS = " .:;,-"
+
+# Dòng chuẩn hóa dấu nháy của bản gốc thực tế chỉ thay đúng chuỗi này bằng '"'
+# (cặp """ trong mã gốc tạo thành chuỗi triple-quote)
+_LEGACY_QUOTE_LITERAL = ", '\"').replace("
+
+
+def has_markup(text):
+    """Có thẻ HTML hoặc entity (&...) thì cần parse bằng BeautifulSoup."""
+    return "<" in text or "&" in text
+
+
+def html_to_text(text):
+    """Bỏ thẻ không cần thiết và lấy text (giống soup.get_text(" ", strip=True))."""
+    if not has_markup(text):
+        # Fast path: text thuần -> html.parser chỉ sinh 1 chuỗi, get_text(strip=True) = strip()
+        return text.strip()
+    soup = BeautifulSoup(text, "html.parser")
+    for tag in soup(REMOVED_TAGS):
+        tag.decompose()
+    return soup.get_text(" ", strip=True)
+
+
+def vietnamese_spacing(text: str) -> str:
+    """Bản nhanh của advanced_vietnamese_spacing (cùng kết quả)."""
+    if not text or not text.strip():
+        return ""
+    if _LEGACY_QUOTE_LITERAL in text:
+        text = text.replace(_LEGACY_QUOTE_LITERAL, '"')
+    text = ViTokenizer.tokenize(text).replace("_", " ")
+    text = CAMEL_SPLIT.sub(r"\1 \2", text)
+    # split()/join gộp khoảng trắng Unicode giống re.sub(r"\s+", " ").strip()
+    return " ".join(text.split())
+
+
+def normalize_content(raw: str) -> str:
+    """Bản nhanh của clean_content (cùng kết quả)."""
+    if not raw:
+        return ""
+    text = raw
+
+    # 1: Xóa nội dung blacklist (chỉ chạy regex khi có chuỗi kết thúc)
+    if _BLACKLIST_END.search(text):
+        for pattern in BLACKLIST_PATTERNS:
+            text = pattern.sub(" ", text)
+
+    # 2: HTML -> text (bỏ qua parse khi không có markup)
+    clean = html_to_text(text)
+
+    # 3: Gộp khoảng trắng, xóa ký tự thừa đầu/cuối đoạn
+    clean = " ".join(clean.split()).strip(EDGE_CHARS)
+
+    # 4: Thêm dấu chấm cuối câu nếu chưa có
+    if clean and clean[-1] not in ".?!":
+        clean += "."
+
+    # 5: Tách từ tiếng Việt
+    return vietnamese_spacing(clean)
+
+
+# =============================================
+# BẢN GỐC (THAM CHIẾU)
+# Mục đích: Giữ nguyên logic cũ để benchmark so sánh kết quả và tốc độ
+# =============================================
+def legacy_vietnamese_spacing(text: str) -> str:
+    if not text or not text.strip():
+        return ""
+    text = text.replace("'", "'").replace("'", "'").replace(""", '"').replace(""", '"')
+    text = ViTokenizer.tokenize(text).replace("_", " ")
+    text = re.sub(r"([a-zàáạảãâăêôơưéèẻẽẹđỳỳỷỹ])([A-ZÀÁẠẢÃÂĂÊÔƠƯÉÈẺẼẸĐỲỶỸ])", r"\1 \2", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def legacy_clean_content(raw: str) -> str:
+    if not raw:
+        return ""
+    text = raw
+    blacklist_patterns = [
+        r"Video Player.*?End of dialog window",
+        r"This is a modal window.*?End of dialog window"
+    ]
+    for pattern in blacklist_patterns:
+        text = re.sub(pattern, " ", text, flags=re.IGNORECASE | re.DOTALL)
+    soup = BeautifulSoup(text, "html.parser")
+    for tag in soup(["script", "style", "iframe", "video", "source", "button", "noscript", "meta", "link"]):
+        tag.decompose()
+    clean = soup.get_text(" ", strip=True)
+    clean = re.sub(r"\s+", " ", clean)
+    clean = re.sub(r"^[\s\.:;,-]+", "", clean)
+    clean = re.sub(r"[\s\.:;,-]+$", "", clean)
+    clean = clean.strip()
+    if clean and clean[-1] not in ".?!":
+        clean += "."
+    clean = legacy_vietnamese_spacing(clean)
+    return clean
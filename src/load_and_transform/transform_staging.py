@@ -1,12 +1,34 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from src.utils.db_utils import connect_to_db
-from src.utils.log_utils import log_start, log_end
-from bs4 import BeautifulSoup
-import re
+from src.utils.log_utils import log_start, log_end, log_progress
+from src.utils.metrics import RunMetrics
+from src.utils.watermark import get_watermark, set_watermark
+from src.load_and_transform.clean_cache import CleanCache, cache_key
+from src.load_and_transform.text_normalizer import normalize_content, vietnamese_spacing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pyvi import ViTokenizer
 
+# Số dòng mỗi lô khi đọc staging_temp_table / insert vào staging_clean_table
+TRANSFORM_BATCH_ROWS = int(os.getenv("TRANSFORM_BATCH_ROWS", "500"))
+# Số tiến trình chạy clean_content song song (1 = chạy tuần tự) và số bài gửi cho mỗi tiến trình 1 lần
+# Mặc định tuần tự: mỗi tiến trình phải tự nạp pyvi nên pool chỉ đáng khi lượng bài cần clean lớn
+TRANSFORM_WORKERS = int(os.getenv("TRANSFORM_WORKERS", "1"))
+# Chỉ mở pool tiến trình khi 1 lô có ít nhất N bài chưa có trong cache (lô nhỏ hơn clean tuần tự)
+TRANSFORM_PARALLEL_MIN_ROWS = int(os.getenv("TRANSFORM_PARALLEL_MIN_ROWS", "200"))
+TRANSFORM_CHUNK_SIZE = int(os.getenv("TRANSFORM_CHUNK_SIZE", "16"))
+# Cache kết quả clean_content theo hash nội dung thô (TRANSFORM_CACHE_ENABLED=0 để tắt)
+TRANSFORM_CACHE_ENABLED = os.getenv("TRANSFORM_CACHE_ENABLED", "1") == "1"
+TRANSFORM_CACHE_PATH = os.getenv("TRANSFORM_CACHE_PATH", os.path.join("source", "cache", "clean_cache.db"))
+TRANSFORM_CACHE_MAX_MB = int(os.getenv("TRANSFORM_CACHE_MAX_MB", "512"))
+# Tăng khi đổi logic clean_content / advanced_vietnamese_spacing để bỏ kết quả cache cũ
+CLEANER_VERSION = "1"
+
+CLEAN_COLUMNS = ["article_url", "source_name", "category", "author", "published_at",
+                 "title", "summary", "content", "tags", "scraped_at"]
 
 # =============================================
 # SIÊU HÀM FIX DÍNH TỪ TIẾNG VIỆT
@@ -14,27 +36,11 @@ from pyvi import ViTokenizer
 # =============================================
 def advanced_vietnamese_spacing(text: str) -> str:
     """
-    Xử lý khoảng trắng và tách từ tiếng Việt
+    Xử lý khoảng trắng và tách từ tiếng Việt (pattern biên dịch sẵn trong text_normalizer)
     Input: text - Chuỗi văn bản tiếng Việt cần xử lý
     Output: Chuỗi đã được tách từ và chuẩn hóa khoảng trắng
     """
-    # Kiểm tra input rỗng
-    if not text or not text.strip():
-        return ""
-    
-    # Chuẩn hóa dấu nháy đơn và nháy kép
-    text = text.replace("'", "'").replace("'", "'").replace(""", '"').replace(""", '"')
-    
-    # Tách từ tiếng Việt bằng ViTokenizer và thay thế dấu gạch dưới
-    text = ViTokenizer.tokenize(text).replace("_", " ")
-    
-    # Xử lý các trường hợp dính từ (chữ thường dính chữ hoa)
-    text = re.sub(r"([a-zàáạảãâăêôơưéèẻẽẹđỳỳỷỹ])([A-ZÀÁẠẢÃÂĂÊÔƠƯÉÈẺẼẸĐỲỶỸ])", r"\1 \2", text)
-    
-    # Chuẩn hóa nhiều khoảng trắng thành 1 khoảng trắng
-    text = re.sub(r"\s+", " ", text).strip()
-    
-    return text
+    return vietnamese_spacing(text)
 
 
 # =============================================
@@ -43,54 +49,16 @@ def advanced_vietnamese_spacing(text: str) -> str:
 # =============================================
 def clean_content(raw: str) -> str:
     """
-    Làm sạch nội dung HTML và chuẩn hóa text
+    Làm sạch nội dung HTML và chuẩn hóa text (bỏ qua parse HTML khi nội dung là text thuần)
     Input: raw - Chuỗi HTML thô
     Output: Chuỗi văn bản đã được làm sạch
     """
-    # Kiểm tra input rỗng
-    if not raw:
-        return ""
-    text = raw
-    
-    # Loại bỏ các nội dung blacklist (Video Player, Modal window)
-    blacklist_patterns = [
-        r"Video Player.*?End of dialog window",
-        r"This is a modal window.*?End of dialog window"
-    ]
-    for pattern in blacklist_patterns:
-        text = re.sub(pattern, " ", text, flags=re.IGNORECASE | re.DOTALL)
-
-    # Parse HTML bằng BeautifulSoup
-    soup = BeautifulSoup(text, "html.parser")
-    
-    # Loại bỏ các thẻ HTML không cần thiết
-    for tag in soup(["script", "style", "iframe", "video", "source", "button", "noscript", "meta", "link"]):
-        tag.decompose()
+    return normalize_content(raw)
 
-    # Trích xuất text từ HTML
-    clean = soup.get_text(" ", strip=True)
 
-    # ================= CHUẨN HÓA KHOẢNG TRẮNG & DẤU CÂU =================
-    # Chuẩn hóa nhiều khoảng trắng thành 1
-    clean = re.sub(r"\s+", " ", clean)
-    
-    # Xóa ký tự thừa đầu đoạn
-    clean = re.sub(r"^[\s\.:;,-]+", "", clean)
-    
-    # Xóa ký tự thừa cuối đoạn
-    clean = re.sub(r"[\s\.:;,-]+$", "", clean)
-    
-    # Trim khoảng trắng đầu cuối
-    clean = clean.strip()
-    
-    # Thêm dấu chấm cuối câu nếu chưa có
-    if clean and clean[-1] not in ".?!":
-        clean += "."
-
-    # Áp dụng xử lý tách từ tiếng Việt
-    clean = advanced_vietnamese_spacing(clean)
-    
-    return clean
+def _init_clean_worker():
+    """Khởi tạo tiến trình con: nạp model pyvi 1 lần trước khi nhận việc."""
+    ViTokenizer.tokenize("khởi động")
 
 
 # =============================================
@@ -101,11 +69,20 @@ class TransformLoader:
     """
     Class quản lý quá trình Transform dữ liệu
     """
-    def __init__(self, db="news_staging_db", job_name="Transform_Staging"):
+    def __init__(self, db="news_staging_db", job_name="Transform_Staging", batch_rows=TRANSFORM_BATCH_ROWS,
+                 workers=TRANSFORM_WORKERS, chunk_size=TRANSFORM_CHUNK_SIZE, full=False):
         """
         Khởi tạo TransformLoader
         """
         # 1: Kết nối database
+        self.db = db
+        self.batch_rows = batch_rows
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.executor = None
+        # full=True: transform toàn bộ staging (backfill); mặc định chỉ các run_id staging mới hơn watermark
+        self.full = full
+        self.cache = CleanCache(TRANSFORM_CACHE_PATH, TRANSFORM_CACHE_MAX_MB * 1024 * 1024) if TRANSFORM_CACHE_ENABLED else None
         self.conn = connect_to_db(db)
         
         # 2: Tạo cursor
@@ -115,10 +92,38 @@ class TransformLoader:
         # 3: Log START và lấy run_id
         self.run_id, _ = log_start(job_name)
         print(f"[INFO] RUN_ID: {self.run_id}")
+        self.metrics = RunMetrics(self.run_id, job_name)
+
+    def _clean_many(self, raw_contents):
+        """clean_content cho danh sách bài: đủ nhiều bài thì chạy trên pool tiến trình (mở lần đầu cần tới)."""
+        if self.workers <= 1 or len(raw_contents) < TRANSFORM_PARALLEL_MIN_ROWS:
+            return [clean_content(raw) for raw in raw_contents]
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_clean_worker)
+            print(f"[INFO] Clean song song: {self.workers} tiến trình, {self.chunk_size} bài/lần gửi.")
+        return list(self.executor.map(clean_content, raw_contents, chunksize=self.chunk_size))
+
+    def _clean_batch(self, raw_contents):
+        """clean_content cho 1 lô, trả về kết quả đúng thứ tự đầu vào; dùng cache nếu bật."""
+        if not self.cache:
+            return self._clean_many(raw_contents)
+
+        keys = [cache_key(raw, CLEANER_VERSION) for raw in raw_contents]
+        cleaned = self.cache.get_many(keys)
+        # Bài trùng nội dung trong cùng lô chỉ clean 1 lần
+        misses = {key: raw for key, raw in zip(keys, raw_contents) if key not in cleaned}
+        if misses:
+            results = self._clean_many(list(misses.values()))
+            fresh = dict(zip(misses, results))
+            self.cache.put_many(fresh)
+            cleaned.update(fresh)
+        return [cleaned[key] for key in keys]
 
     def build_clean_staging(self):
         """
-        Xây dựng bảng staging_clean_table từ staging_temp_table
+        Xây dựng bảng staging_clean_table từ staging_temp_table.
+        Chế độ incremental chỉ lấy dòng có run_id (lượt load staging) lớn hơn watermark.
+        Trả về (số dòng, run_id staging lớn nhất đã đọc).
         """
         # 4: Tạo bảng staging_clean_table
         self.cursor.execute("""
@@ -137,35 +142,79 @@ class TransformLoader:
             )
         """)
         
-        # 5: Truncate bảng để xóa dữ liệu cũ
+        # 5: Truncate bảng để xóa dữ liệu cũ (bảng chỉ chứa phần delta của lần chạy này)
         self.cursor.execute("TRUNCATE TABLE staging_clean_table")
 
-        # 6: Lấy tất cả dữ liệu từ staging_temp_table
-        self.cursor.execute("SELECT * FROM staging_temp_table")
-        rows = self.cursor.fetchall()
-        
+        # 5.1: Đọc watermark (run_id staging lớn nhất đã transform)
+        watermark = None if self.full else get_watermark(self.job_name)
+        if self.full:
+            print("[INFO] Chế độ FULL: transform toàn bộ staging_temp_table.")
+        else:
+            print(f"[INFO] Chế độ incremental: run_id staging > {watermark if watermark is not None else '(chưa có)'}")
+
+        # 6: Đọc staging_temp_table bằng cursor unbuffered trên kết nối riêng
+        #    (dữ liệu về theo từng lô fetchmany, không nạp cả bảng vào bộ nhớ)
+        read_conn = connect_to_db(self.db)
+        if not read_conn:
+            raise ConnectionError(f"Không kết nối được {self.db} để đọc staging_temp_table")
+        read_cursor = read_conn.cursor(dictionary=True, buffered=False)
+
+        row_sql = "(" + ", ".join(["%s"] * len(CLEAN_COLUMNS)) + ")"
+        insert_prefix = f"INSERT INTO staging_clean_table ({', '.join(CLEAN_COLUMNS)}) VALUES "
         count = 0
-        # 7: Lặp qua từng record để clean và insert
-        for row in rows:
-            # 7.1: Clean content
-            cleaned_content = clean_content(row.get("content", ""))
-            
-            # 7.2: Insert vào staging_clean_table
-            self.cursor.execute("""
-                INSERT INTO staging_clean_table
-                (article_url, source_name, category, author, published_at,
-                 title, summary, content, tags, scraped_at)
-                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            """, (
-                row.get("article_url"), row.get("source_name"), row.get("category"),
-                row.get("author"), row.get("published_at"), row.get("title"),
-                row.get("summary"), cleaned_content, row.get("tags"), row.get("scraped_at")
-            ))
-            count += 1
-        
-        # 8: Commit transaction
-        self.conn.commit()
-        print(f"[INFO] Cleaned {count} records.")
+        max_run_id = None
+        start = time.perf_counter()
+        # 6.1: Chế độ song song (workers > 1): pool tiến trình chỉ mở khi có lô đủ lớn (_clean_many),
+        #      kết quả giữ đúng thứ tự
+        # 7: Mỗi lô: clean content rồi insert nhiều dòng trong 1 câu lệnh, commit theo lô
+        try:
+            with self.metrics.stage("clean_and_insert") as st:
+                # run_id là VARCHAR -> ép kiểu trong SQL để so sánh / lấy max theo số
+                query = f"SELECT CAST(run_id AS UNSIGNED) AS run_no, {', '.join(CLEAN_COLUMNS)} FROM staging_temp_table"
+                if watermark is not None:
+                    read_cursor.execute(query + " WHERE CAST(run_id AS UNSIGNED) > %s", (watermark,))
+                else:
+                    read_cursor.execute(query)
+                while True:
+                    rows = read_cursor.fetchmany(self.batch_rows)
+                    if not rows:
+                        break
+                    # 7.1: Clean content (bài đã có trong cache thì bỏ qua)
+                    raw_contents = [row.get("content", "") for row in rows]
+                    cleaned_contents = self._clean_batch(raw_contents)
+                    run_ids = [row["run_no"] for row in rows if row.get("run_no") is not None]
+                    if run_ids:
+                        max_run_id = max(run_ids + ([max_run_id] if max_run_id is not None else []))
+
+                    params = []
+                    for row, raw_content, cleaned_content in zip(rows, raw_contents, cleaned_contents):
+                        st.bytes_read += len((raw_content or "").encode("utf-8"))
+                        st.bytes_written += len(cleaned_content.encode("utf-8"))
+                        params.extend(cleaned_content if col == "content" else row.get(col) for col in CLEAN_COLUMNS)
+
+                    # 7.2: Insert cả lô vào staging_clean_table
+                    self.cursor.execute(insert_prefix + ", ".join([row_sql] * len(rows)), params)
+                    self.conn.commit()
+                    count += len(rows)
+                    st.rows = count
+        finally:
+            if self.executor:
+                self.executor.shutdown(cancel_futures=True)
+                self.executor = None
+            # Lỗi giữa chừng thì cursor còn kết quả chưa đọc -> bỏ qua lỗi khi đóng
+            try:
+                read_cursor.close()
+            except Exception:
+                pass
+            read_conn.close()
+
+        # 8: Báo tốc độ clean + tỉ lệ trúng cache (ghi vào tiến độ của run)
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] Cleaned {count} records in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f} rows/sec).")
+        if self.cache:
+            log_progress(self.run_id, self.job_name, count,
+                         f"clean cache hit {self.cache.hits} / miss {self.cache.misses}")
+        return count, max_run_id
 
     def run_transform(self):
         """
@@ -173,17 +222,27 @@ class TransformLoader:
         """
         total_raw = total_success = total_failed = 0
         try:
-            # 9: Build clean staging table
-            self.build_clean_staging()
+            # 9: Build clean staging table (chỉ phần delta nếu incremental)
+            total_clean, max_run_id = self.build_clean_staging()
+            if not total_clean and not self.full:
+                log_end(self.run_id, "SUCCESS", 0, 0)
+                print("[OK] Không có dữ liệu staging mới kể từ watermark, bỏ qua transform.")
+                return
             
             # 10: Gọi stored procedure transform
-            self.cursor.callproc("sp_transform_news_data", [self.run_id])
-            self.conn.commit()
-            
-            # 11: Đếm số record transform thành công
-            self.cursor.execute("SELECT COUNT(*) AS cnt FROM transformed_temp_table WHERE run_id=%s", (self.run_id,))
-            total_success = self.cursor.fetchone()["cnt"]
-            total_raw = total_success
+            with self.metrics.stage("sp_transform_news_data") as st:
+                self.cursor.callproc("sp_transform_news_data", [self.run_id])
+                self.conn.commit()
+                
+                # 11: Đếm số record transform thành công
+                self.cursor.execute("SELECT COUNT(*) AS cnt FROM transformed_temp_table WHERE run_id=%s", (self.run_id,))
+                total_success = self.cursor.fetchone()["cnt"]
+                total_raw = total_success
+                st.rows = total_success
+
+            # 11.1: Đẩy watermark tới run_id staging lớn nhất vừa transform
+            if max_run_id is not None:
+                set_watermark(self.job_name, max_run_id, self.run_id)
             
             # 12: Log END với status SUCCESS
             log_end(self.run_id, "SUCCESS", total_raw, total_success)
@@ -195,12 +254,16 @@ class TransformLoader:
             log_end(self.run_id, "FAILED", total_raw, total_success, str(e))
             print(f"[ERROR] Transform failed: {e}")
             self.conn.rollback()
+        finally:
+            self.metrics.save()
 
     def close(self):
         """
         Đóng kết nối database
         """
-        # 13: Đóng cursor
+        # 13: Đóng cache và cursor
+        if self.cache:
+            self.cache.close()
         self.cursor.close()
         
         # 14: Đóng connection
@@ -208,8 +271,12 @@ class TransformLoader:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transform staging_temp_table -> staging_clean_table")
+    parser.add_argument("--full", action="store_true", help="Transform toàn bộ staging (backfill), bỏ qua watermark")
+    args = parser.parse_args()
+
     # Khởi tạo TransformLoader
-    loader = TransformLoader()
+    loader = TransformLoader(full=args.full)
     try:
         #  Chạy quá trình Transform
         loader.run_transform()
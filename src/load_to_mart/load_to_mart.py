@@ -3,11 +3,12 @@
 import os
 import sys
 import uuid
-import pandas as pd
 from datetime import date
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from src.utils.db_utils import connect_to_db
+from src.utils.db_utils import connect_for_bulk_load
 from src.utils.log_utils import log_start, log_end
+from src.utils.metrics import RunMetrics
+from src.utils.bulk_loader import load_csv, read_csv_header
 
 # --- Cấu hình File & Constants ---
 TODAY_STR = date.today().strftime("%Y%m%d")
@@ -26,17 +27,12 @@ def get_create_table_query(prod_table_name, temp_table_name):
     """Tạo lệnh CREATE TABLE LIKE để tạo bảng tạm dựa trên cấu trúc bảng Production."""
     return f"CREATE TABLE {temp_table_name} LIKE {prod_table_name}"
 
-def get_insert_query(table_name, df_cols):
-    """Tạo INSERT query động dựa trên tên bảng và cột."""
-    cols = ", ".join(df_cols)
-    placeholders = ", ".join(["%s"] * len(df_cols))
-    return f"INSERT INTO {table_name} ({cols}) VALUES ({placeholders})"
-
 def run_load_mart_job():
     job_name = "load_to_datamart"
     run_id_load, conn_control = log_start(job_name)
     print(f"Run ID Load Data Mart: {run_id_load}")
     if not run_id_load: return
+    metrics = RunMetrics(run_id_load, job_name)
         
     conn_mart = None
     total_records_loaded = 0
@@ -46,7 +42,7 @@ def run_load_mart_job():
     current_table_name = "" # Dùng để ghi log lỗi chính xác
 
     try:
-        conn_mart = connect_to_db("news_mart_db")
+        conn_mart = connect_for_bulk_load("news_mart_db")
         if not conn_mart: raise Exception("Không thể kết nối Data Mart.")
         cursor_mart = conn_mart.cursor()
 
@@ -59,40 +55,37 @@ def run_load_mart_job():
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"Thiếu file: {file_name}")
 
-            df = pd.read_csv(file_path, encoding='utf8', keep_default_na=False)
-            extracted = len(df)
-
-            # XỬ LÝ DỮ LIỆU & TÊN CỘT (Fix NaN/Missing Headers)
-            # Chuyển đổi tất cả các giá trị NaN (tức là ô trống) thành None 
-            # để MySQL chấp nhận NULL
-            df = df.where(pd.notna(df), None)
-            df.columns = [str(col).strip() for col in df.columns]
-            valid_cols = [col for col in df.columns if col.lower() not in ('nan', 'unnamed: 0') and col != '']
-
-            # 2. CREATE TABLE LIKE (Tạo bảng Tạm)
-            create_query = get_create_table_query(prod_name, temp_table_name)
-            print(f"-> 1. Tạo bảng tạm {temp_table_name}...")
-            cursor_mart.execute(create_query)
-
-            # 3. INSERT DỮ LIỆU VÀO BẢNG TẠM
-            print(f"-> Nạp {extracted} dòng vào {temp_table_name}...")
-            insert_query = get_insert_query(temp_table_name, valid_cols)
-            data_to_insert = [tuple(row) for row in df[valid_cols].values]
-            
-            cursor_mart.executemany(insert_query, data_to_insert)
-            total_records_loaded += extracted
+            with metrics.stage(f"load_{table_name_short}") as st:
+                st.bytes_read = os.path.getsize(file_path)
+
+                # XỬ LÝ TÊN CỘT (Fix Missing Headers): cột không hợp lệ trong header bị bỏ qua
+                header = [str(col).strip() for col in read_csv_header(file_path)]
+                columns = [col if col.lower() not in ('nan', 'unnamed: 0') and col != '' else None for col in header]
+
+                # 2. CREATE TABLE LIKE (Tạo bảng Tạm)
+                create_query = get_create_table_query(prod_name, temp_table_name)
+                print(f"-> 1. Tạo bảng tạm {temp_table_name}...")
+                cursor_mart.execute(create_query)
+
+                # 3. NẠP FILE VÀO BẢNG TẠM (LOAD DATA / INSERT theo lô)
+                extracted, method = load_csv(conn_mart, temp_table_name, file_path, columns)
+                print(f"-> Nạp {extracted} dòng vào {temp_table_name} ({method})...")
+                total_records_loaded += extracted
+                st.rows = extracted
 
             # 4. CHUẨN BỊ LỆNH RENAME
             rename_commands.append(f"RENAME TABLE {temp_table_name} TO {prod_name}")
 
         print("\n=== BẮT ĐẦU HOÁN ĐỔI SCHEMA (Zero Downtime) ===")
         # 5. DROP bảng Production cũ và RENAME bảng tạm mới   
-        for cmd in rename_commands:
-            prod_name = cmd.split(' TO ')[1]
-            cursor_mart.execute(f"DROP TABLE IF EXISTS {prod_name}")
-            cursor_mart.execute(cmd) 
-
-        conn_mart.commit()
+        with metrics.stage("swap_tables") as st:
+            for cmd in rename_commands:
+                prod_name = cmd.split(' TO ')[1]
+                cursor_mart.execute(f"DROP TABLE IF EXISTS {prod_name}")
+                cursor_mart.execute(cmd) 
+
+            conn_mart.commit()
+            st.rows = len(rename_commands)
         
         # 6. Ghi log END SUCCESS
         log_end(run_id_load, "SUCCESS", records_extracted=total_records_loaded, records_loaded=total_records_loaded)
@@ -117,6 +110,7 @@ def run_load_mart_job():
         print(f"FAIL: {error_msg}.")
 
     finally:
+        metrics.save()
         if conn_mart: conn_mart.close()
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ warnings.filterwarnings("ignore")
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.db_utils import connect_to_db
 from utils.log_utils import log_start, log_end
+from utils.metrics import RunMetrics
 
 def run_incremental_etl():
     # 1. KHỞI TẠO: Định nghĩa tên Job và Config
@@ -27,6 +28,8 @@ def run_incremental_etl():
         # [NHÁNH NO]: Dừng chương trình nếu không có ID
         print("Không khởi tạo được Run ID. Dừng chương trình.")
         return
+    metrics = RunMetrics(run_id, JOB_NAME)
+
     # 5. KẾT NỐI DB: Kết nối tới news_staging_db
     conn = connect_to_db("news_staging_db")
 
@@ -40,18 +43,23 @@ def run_incremental_etl():
         cursor = conn.cursor()
         print(f"[RunID: {run_id}] Đang gọi Procedure...")
         
-        # 7. GỌI PROCEDURE (load_to_staging_delta): Thực thi logic Incremental bên SQL
-        cursor.callproc('load_to_staging_delta')
-        
-        result_value = None
+        with metrics.stage("sp_load_to_staging_delta") as st:
+            # 7. GỌI PROCEDURE (load_to_staging_delta): Thực thi logic Incremental bên SQL
+            cursor.callproc('load_to_staging_delta')
+            
+            result_value = None
 
-        # 8. NHẬN KẾT QUẢ: Lấy output từ SQL (Số dòng hoặc Thông báo lỗi)
-        for result in cursor.stored_results():
-            row = result.fetchone()
-            if row: result_value = row[0]
+            # 8. NHẬN KẾT QUẢ: Lấy output từ SQL (Số dòng hoặc Thông báo lỗi)
+            for result in cursor.stored_results():
+                row = result.fetchone()
+                if row: result_value = row[0]
 
-        # 9. COMMIT: Xác nhận giao dịch
-        conn.commit()
+            # 9. COMMIT: Xác nhận giao dịch
+            conn.commit()
+            if isinstance(result_value, int):
+                st.rows = result_value
+            else:
+                st.status = "FAILED"
 
         # 10. PHÂN LOẠI KẾT QUẢ: Kiểm tra kiểu dữ liệu trả về
 
@@ -81,6 +89,7 @@ def run_incremental_etl():
         log_end(run_id, "FAILED", 0, 0, err_msg)
         
     finally:
+        metrics.save()
         # 12. DỌN DẸP: Đóng kết nối Database
         if (conn.is_connected()):
             cursor.close()
@@ -0,0 +1,281 @@
+import os
+import csv
+import gzip
+import shutil
+import tempfile
+import mysql.connector
+from .db_utils import DB_LOCAL_INFILE_DIR
+
+# Cách nạp CSV: 'auto' (LOAD DATA, lỗi quyền thì chuyển sang INSERT), 'load_data' hoặc 'insert'
+BULK_LOAD_METHOD = os.getenv("BULK_LOAD_METHOD", "auto")
+BULK_INSERT_CHUNK_ROWS = int(os.getenv("BULK_INSERT_CHUNK_ROWS", "1000"))
+# Số dòng mỗi lô khi nạp theo luồng (stream_csv), mỗi lô commit 1 lần
+BULK_STREAM_CHUNK_ROWS = int(os.getenv("BULK_STREAM_CHUNK_ROWS", "5000"))
+
+# File tạm cho LOAD DATA (giải nén .gz, file lô của stream_csv) nằm trong thư mục được phép LOCAL INFILE
+BULK_TEMP_DIR = os.path.join(DB_LOCAL_INFILE_DIR, "tmp")
+
+# Mã lỗi khi LOCAL INFILE bị tắt ở client hoặc server
+LOCAL_INFILE_DISABLED_ERRNOS = {1148, 2068, 3948, 3950}
+
+# Tiến trình đã gặp LOCAL INFILE bị tắt thì không thử lại
+_local_infile_disabled = False
+
+csv.field_size_limit(2 ** 31 - 1)
+
+
+class ChunkLoadError(Exception):
+    """Lỗi khi nạp 1 lô của stream_csv: giữ số thứ tự lô và vị trí dòng đầu lô (tính từ 0, không kể header)."""
+
+    def __init__(self, chunk_no, row_offset, rows_committed, cause):
+        self.chunk_no = chunk_no
+        self.row_offset = row_offset
+        self.rows_committed = rows_committed
+        self.cause = cause
+        super().__init__(f"Lô {chunk_no} (từ dòng {row_offset}, đã commit {rows_committed} dòng): {cause}")
+
+
+def _temp_csv(prefix="tmp"):
+    os.makedirs(BULK_TEMP_DIR, exist_ok=True)
+    return tempfile.mkstemp(suffix=".csv", prefix=prefix, dir=BULK_TEMP_DIR)
+
+def _infile_allowed(path):
+    """Kết nối nạp dữ liệu chỉ được LOAD DATA LOCAL file trong DB_LOCAL_INFILE_DIR."""
+    base = os.path.realpath(DB_LOCAL_INFILE_DIR)
+    return os.path.realpath(path).startswith(base + os.sep)
+
+def open_text(path, encoding="utf-8-sig"):
+    """Mở file CSV dạng text (hỗ trợ .gz)."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding=encoding, newline="")
+    return open(path, "r", encoding=encoding, newline="")
+
+def read_csv_header(path, delimiter=","):
+    with open_text(path) as f:
+        return next(csv.reader(f, delimiter=delimiter), [])
+
+def _detect_line_terminator(path):
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        head = f.read(64 * 1024)
+    return "\r\n" if b"\r\n" in head else "\n"
+
+def _resolve_columns(path, columns, delimiter, skip_header):
+    """columns: list theo vị trí cột CSV (None = bỏ cột) hoặc dict {vị trí: tên cột}."""
+    if isinstance(columns, dict):
+        with open_text(path) as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            if skip_header:
+                next(reader, None)
+            width = len(next(reader, []))
+        width = max(width, max(columns) + 1)
+        return [columns.get(i) for i in range(width)]
+    return list(columns)
+
+
+# =============================================
+# BULK LOADER
+# Mục đích: Nạp CSV vào MySQL bằng LOAD DATA LOCAL INFILE,
+#           tự chuyển sang INSERT nhiều dòng theo lô khi LOCAL INFILE bị tắt
+# =============================================
+def load_csv(conn, table, csv_path, columns, skip_header=True, delimiter=",", empty_as_null=False,
+             constants=None, charset="utf8mb4", method=None, chunk_rows=None, on_chunk=None):
+    """
+    Nạp file CSV vào `table`. Không commit (transaction do nơi gọi quản lý).
+    - columns: tên cột đích theo thứ tự cột trong CSV, None = bỏ cột đó (hoặc dict {vị trí: tên cột}).
+    - empty_as_null: chuỗi rỗng -> NULL (giống pandas đọc NaN -> None).
+    - constants: {cột: giá trị} gán cho mọi dòng (vd: run_id).
+    - on_chunk(rows_done): gọi sau mỗi lô khi dùng INSERT.
+    Trả về (số dòng đã nạp, cách nạp 'load_data' / 'insert').
+    """
+    global _local_infile_disabled
+    method = method or BULK_LOAD_METHOD
+    columns = _resolve_columns(csv_path, columns, delimiter, skip_header)
+    constants = constants or {}
+
+    # File nằm ngoài DB_LOCAL_INFILE_DIR (không phải .gz sẽ được giải nén vào đó) -> INSERT
+    outside = not csv_path.endswith(".gz") and not _infile_allowed(csv_path)
+    if method in ("auto", "load_data") and not (method == "auto" and (_local_infile_disabled or outside)):
+        try:
+            rows = _load_data_infile(conn, table, csv_path, columns, skip_header, delimiter,
+                                     empty_as_null, constants, charset)
+            return rows, "load_data"
+        except mysql.connector.Error as e:
+            if method != "auto" or e.errno not in LOCAL_INFILE_DISABLED_ERRNOS:
+                raise
+            _local_infile_disabled = True
+            print(f"[BULK] LOCAL INFILE bị tắt ({e.errno}), chuyển sang INSERT theo lô.")
+
+    rows = _chunked_insert(conn, table, csv_path, columns, skip_header, delimiter,
+                           empty_as_null, constants, chunk_rows or BULK_INSERT_CHUNK_ROWS, on_chunk)
+    return rows, "insert"
+
+
+def _load_data_infile(conn, table, csv_path, columns, skip_header, delimiter, empty_as_null, constants, charset):
+    # 1: LOAD DATA không đọc được file nén -> giải nén ra file tạm
+    tmp_path = None
+    if csv_path.endswith(".gz"):
+        fd, tmp_path = _temp_csv()
+        with os.fdopen(fd, "wb") as out, gzip.open(csv_path, "rb") as src:
+            shutil.copyfileobj(src, out)
+    path = tmp_path or csv_path
+
+    try:
+        # 2: Ánh xạ cột: cột bỏ qua -> @dummy, cột rỗng thành NULL -> qua biến @c{i}
+        targets, sets, params = [], [], []
+        for i, col in enumerate(columns):
+            if col is None:
+                targets.append("@dummy")
+            elif empty_as_null:
+                targets.append(f"@c{i}")
+                sets.append(f"`{col}` = NULLIF(@c{i}, '')")
+            else:
+                targets.append(f"`{col}`")
+        for col, value in constants.items():
+            sets.append(f"`{col}` = %s")
+            params.append(value)
+
+        line_end = _detect_line_terminator(path).replace("\r", "\\r").replace("\n", "\\n")
+        sql = f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE `{table}`
+            CHARACTER SET {charset}
+            FIELDS TERMINATED BY '{delimiter}' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '{line_end}'
+            {"IGNORE 1 LINES" if skip_header else ""}
+            ({", ".join(targets)})
+            {("SET " + ", ".join(sets)) if sets else ""}
+        """
+        cursor = conn.cursor()
+        cursor.execute(sql, [os.path.abspath(path).replace("\\", "/")] + params)
+        rows = cursor.rowcount
+        cursor.close()
+        return rows
+    finally:
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+def _insert_statement(table, columns, constants):
+    keep = [i for i, col in enumerate(columns) if col is not None]
+    target_cols = [columns[i] for i in keep] + list(constants)
+    row_sql = "(" + ", ".join(["%s"] * len(target_cols)) + ")"
+    prefix = f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in target_cols)}) VALUES "
+    return keep, prefix, row_sql
+
+def _insert_rows(cursor, prefix, row_sql, keep, records, empty_as_null, const_values):
+    """INSERT nhiều dòng trong 1 câu lệnh."""
+    params = []
+    for record in records:
+        for i in keep:
+            value = record[i] if i < len(record) else None
+            params.append(None if empty_as_null and value == "" else value)
+        params.extend(const_values)
+    cursor.execute(prefix + ", ".join([row_sql] * len(records)), params)
+
+def _read_records(csv_path, delimiter, skip_header):
+    with open_text(csv_path) as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        if skip_header:
+            next(reader, None)
+        for record in reader:
+            if record:
+                yield record
+
+def _chunked_insert(conn, table, csv_path, columns, skip_header, delimiter, empty_as_null, constants, chunk_rows, on_chunk):
+    keep, prefix, row_sql = _insert_statement(table, columns, constants)
+    const_values = list(constants.values())
+    cursor = conn.cursor()
+    total = 0
+    chunk = []
+    for record in _read_records(csv_path, delimiter, skip_header):
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            _insert_rows(cursor, prefix, row_sql, keep, chunk, empty_as_null, const_values)
+            total += len(chunk)
+            chunk = []
+            if on_chunk:
+                on_chunk(total)
+    if chunk:
+        _insert_rows(cursor, prefix, row_sql, keep, chunk, empty_as_null, const_values)
+        total += len(chunk)
+        if on_chunk:
+            on_chunk(total)
+    cursor.close()
+    return total
+
+
+# =============================================
+# STREAMING LOADER
+# Mục đích: Nạp CSV lớn theo từng lô, bộ nhớ chỉ giữ 1 lô, mỗi lô 1 transaction
+# =============================================
+def stream_csv(conn, table, csv_path, columns, chunk_rows=None, skip_header=True, delimiter=",",
+               empty_as_null=False, constants=None, charset="utf8mb4", method=None, on_chunk=None):
+    """
+    Đọc CSV theo luồng, mỗi lô `chunk_rows` dòng được nạp (LOAD DATA qua file tạm của lô,
+    hoặc INSERT nhiều dòng) rồi commit ngay.
+    - on_chunk(chunk_no, rows_done): gọi sau mỗi lô đã commit (báo tiến độ).
+    - Lỗi ở lô nào thì rollback lô đó và raise ChunkLoadError (các lô trước đã commit).
+    Trả về (số dòng đã nạp, cách nạp).
+    """
+    global _local_infile_disabled
+    method = method or BULK_LOAD_METHOD
+    chunk_rows = chunk_rows or BULK_STREAM_CHUNK_ROWS
+    columns = _resolve_columns(csv_path, columns, delimiter, skip_header)
+    constants = constants or {}
+    use_load_data = method in ("auto", "load_data") and not (method == "auto" and _local_infile_disabled)
+    keep, prefix, row_sql = _insert_statement(table, columns, constants)
+    const_values = list(constants.values())
+
+    fd, chunk_path = _temp_csv("chunk_")
+    os.close(fd)
+    cursor = conn.cursor()
+    total = 0
+    chunk_no = 0
+    offset = 0
+
+    def load_chunk(records):
+        nonlocal use_load_data
+        global _local_infile_disabled
+        if use_load_data:
+            with open(chunk_path, "w", encoding="utf-8", newline="") as f:
+                csv.writer(f, delimiter=delimiter, lineterminator="\n").writerows(records)
+            try:
+                return _load_data_infile(conn, table, chunk_path, columns, False, delimiter,
+                                         empty_as_null, constants, charset)
+            except mysql.connector.Error as e:
+                if method != "auto" or e.errno not in LOCAL_INFILE_DISABLED_ERRNOS:
+                    raise
+                use_load_data = False
+                _local_infile_disabled = True
+                print(f"[BULK] LOCAL INFILE bị tắt ({e.errno}), chuyển sang INSERT theo lô.")
+        for start in range(0, len(records), BULK_INSERT_CHUNK_ROWS):
+            _insert_rows(cursor, prefix, row_sql, keep, records[start:start + BULK_INSERT_CHUNK_ROWS],
+                         empty_as_null, const_values)
+        return len(records)
+
+    def commit_chunk(records):
+        nonlocal total, chunk_no, offset
+        chunk_no += 1
+        try:
+            rows = load_chunk(records)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise ChunkLoadError(chunk_no, offset, total, e) from e
+        total += rows
+        offset += len(records)
+        if on_chunk:
+            on_chunk(chunk_no, total)
+
+    try:
+        chunk = []
+        for record in _read_records(csv_path, delimiter, skip_header):
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                commit_chunk(chunk)
+                chunk = []
+        if chunk:
+            commit_chunk(chunk)
+    finally:
+        cursor.close()
+        os.remove(chunk_path)
+    return total, "load_data" if use_load_data else "insert"
@@ -1,22 +1,244 @@
 from dotenv import load_dotenv
 import os
+import time
+import atexit
+import threading
+from collections import deque
 import mysql.connector
 
 load_dotenv()
 
-def connect_to_db(db_name):
+# Pool kết nối dùng chung trong tiến trình (mỗi database 1 pool)
+# DB_POOL_SIZE là cỡ mặc định; nơi dùng nhiều luồng song song (vd: load_staging) nới pool
+# theo số worker bằng ensure_pool_capacity() nên không cần tăng tay khi tăng số worker
+DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "1") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Kết nối rảnh lâu hơn N giây sẽ được ping lại trước khi dùng
+DB_POOL_PING_IDLE = float(os.getenv("DB_POOL_PING_IDLE", "60"))
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# LOAD DATA LOCAL INFILE chỉ bật trên kết nối nạp dữ liệu (connect_for_bulk_load) và chỉ cho đọc file
+# trong DB_LOCAL_INFILE_DIR; mọi kết nối khác (Control DB, mart...) tắt hẳn (server cũng phải bật local_infile)
+DB_ALLOW_LOCAL_INFILE = os.getenv("DB_ALLOW_LOCAL_INFILE", "1") == "1"
+DB_LOCAL_INFILE_DIR = os.path.abspath(os.getenv("DB_LOCAL_INFILE_DIR", os.path.join(BASE_DIR, "source")))
+
+def _open_connection(db_name, bulk_load=False):
+    options = {}
+    if bulk_load and DB_ALLOW_LOCAL_INFILE:
+        os.makedirs(DB_LOCAL_INFILE_DIR, exist_ok=True)
+        options["allow_local_infile_in_path"] = DB_LOCAL_INFILE_DIR
+    conn = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST"),
+        port=os.getenv("MYSQL_PORT"),
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        database=db_name,
+        ssl_disabled=True,
+        allow_local_infile=False,
+        **options
+    )
+    print(f"Kết nối {db_name} thành công!")
+    return conn
+
+
+# =============================================
+# CONNECTION POOL
+# Mục đích: Tái sử dụng kết nối MySQL thay vì mở kết nối mới (TCP + auth) mỗi lần gọi
+# =============================================
+class PooledConnection:
+    """
+    Bọc kết nối MySQL lấy từ pool. Dùng như kết nối thường;
+    close() trả kết nối về pool (session được reset như khi đóng thật: rollback transaction,
+    xóa bảng TEMPORARY, biến session / user).
+    """
+
+    def __init__(self, pool, raw):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_raw", raw)
+
+    def __getattr__(self, name):
+        raw = self._raw
+        if raw is None:
+            raise mysql.connector.errors.OperationalError("Kết nối đã được trả về pool.")
+        return getattr(raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+    def close(self):
+        raw = self._raw
+        if raw is not None:
+            object.__setattr__(self, "_raw", None)
+            self._pool.release(raw)
+
+
+class ConnectionPool:
+    """
+    Pool kết nối của 1 database:
+    - Tối đa `size` kết nối đang được dùng; hết chỗ thì chờ tối đa `timeout` giây.
+      Nới thêm chỗ bằng ensure_size() khi biết trước số luồng dùng song song.
+    - Kết nối rảnh quá `ping_idle` giây được ping (tự kết nối lại) trước khi giao.
+    - Ghi nhận thống kê: số lần lấy, kết nối tạo mới / dùng lại, thời gian chờ lấy kết nối.
+    """
+
+    def __init__(self, db_name, size=5, timeout=30, ping_idle=60, bulk_load=False):
+        self.db_name = db_name
+        self.bulk_load = bulk_load
+        self.name = f"{db_name} (bulk)" if bulk_load else db_name
+        self.size = size
+        self.timeout = timeout
+        self.ping_idle = ping_idle
+        self._idle = deque()
+        self._slots = threading.Semaphore(size)
+        self._lock = threading.Lock()
+        self.stats = {
+            'acquired': 0, 'created': 0, 'reused': 0, 'health_failed': 0, 'timeouts': 0,
+            'in_use': 0, 'wait_total': 0.0, 'wait_max': 0.0
+        }
+
+    def _healthy(self, raw, idle_since):
+        try:
+            if time.monotonic() - idle_since >= self.ping_idle:
+                raw.ping(reconnect=True, attempts=1, delay=0)
+            return raw.is_connected()
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self):
+        """Lấy 1 kết nối (PooledConnection). Raise PoolError nếu chờ quá timeout."""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise mysql.connector.errors.PoolError(
+                f"Hết kết nối trong pool {self.db_name} (size={self.size}) sau {self.timeout}s.")
+        try:
+            raw = None
+            while raw is None:
+                with self._lock:
+                    entry = self._idle.popleft() if self._idle else None
+                if entry is None:
+                    raw = _open_connection(self.db_name, self.bulk_load)
+                    reused = False
+                elif self._healthy(*entry):
+                    raw, reused = entry[0], True
+                else:
+                    with self._lock:
+                        self.stats['health_failed'] += 1
+                    self._discard(entry[0])
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            st = self.stats
+            st['acquired'] += 1
+            st['reused' if reused else 'created'] += 1
+            st['in_use'] += 1
+            st['wait_total'] += waited
+            st['wait_max'] = max(st['wait_max'], waited)
+        return PooledConnection(self, raw)
+
+    def ensure_size(self, size):
+        """Nới pool lên ít nhất `size` kết nối (không thu nhỏ)."""
+        with self._lock:
+            extra = size - self.size
+            if extra <= 0:
+                return
+            self.size = size
+        for _ in range(extra):
+            self._slots.release()
+        print(f"[DB POOL] Nới pool {self.name} lên {size} kết nối.")
+
+    def release(self, raw):
+        try:
+            if raw.is_connected():
+                # Reset session (COM_RESET_CONNECTION): rollback, xóa bảng TEMPORARY, biến session/user,
+                # để người lấy sau nhận kết nối sạch như kết nối mới
+                raw.reset_session()
+                with self._lock:
+                    self._idle.append((raw, time.monotonic()))
+            else:
+                self._discard(raw)
+        except mysql.connector.Error:
+            self._discard(raw)
+        finally:
+            with self._lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Đóng các kết nối đang rảnh."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def snapshot(self):
+        with self._lock:
+            st = dict(self.stats)
+            st['idle'] = len(self._idle)
+        st['size'] = self.size
+        st['wait_avg_ms'] = st['wait_total'] / st['acquired'] * 1000 if st['acquired'] else 0.0
+        st['wait_max_ms'] = st.pop('wait_max') * 1000
+        st.pop('wait_total')
+        return st
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_name, bulk_load=False):
+    with _pools_lock:
+        pool = _pools.get((db_name, bulk_load))
+        if pool is None:
+            pool = _pools[(db_name, bulk_load)] = ConnectionPool(
+                db_name, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_IDLE, bulk_load)
+        return pool
+
+def ensure_pool_capacity(db_name, connections, bulk_load=False):
+    """Đảm bảo pool của db_name cho phép ít nhất `connections` kết nối dùng cùng lúc."""
+    if DB_POOL_ENABLED:
+        get_pool(db_name, bulk_load).ensure_size(connections)
+
+def get_pool_stats():
+    """Thống kê các pool: {db_name: {acquired, created, reused, in_use, idle, wait_avg_ms, ...}}."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.snapshot() for pool in pools}
+
+def print_pool_stats():
+    print("[DB POOL] Thống kê kết nối:")
+    for db_name, st in sorted(get_pool_stats().items()):
+        print(f"    {db_name:<20} | Lấy: {st['acquired']:>5} | Tạo mới: {st['created']} | Dùng lại: {st['reused']} | "
+              f"Đang dùng: {st['in_use']}/{st['size']} | Rảnh: {st['idle']} | "
+              f"Chờ TB: {st['wait_avg_ms']:.1f} ms | Chờ lâu nhất: {st['wait_max_ms']:.1f} ms | "
+              f"Lỗi health check: {st['health_failed']} | Timeout: {st['timeouts']}")
+
+@atexit.register
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+def connect_to_db(db_name, bulk_load=False):
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            port=os.getenv("MYSQL_PORT"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=db_name,
-            ssl_disabled=True
-        )
-        print(f"Kết nối {db_name} thành công!")
-        return conn
+        if not DB_POOL_ENABLED:
+            return _open_connection(db_name, bulk_load)
+        return get_pool(db_name, bulk_load).acquire()
     except mysql.connector.Error as e:
         print(f"Lỗi khi kết nối {db_name}: {e}")
         return None
 
+def connect_for_bulk_load(db_name):
+    """Kết nối dùng cho bulk_loader: được LOAD DATA LOCAL INFILE, chỉ với file trong DB_LOCAL_INFILE_DIR."""
+    return connect_to_db(db_name, bulk_load=True)
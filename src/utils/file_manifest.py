@@ -0,0 +1,118 @@
+import os
+import hashlib
+import mysql.connector
+from .db_utils import connect_to_db
+
+CONTROL_DB = "news_control_db"
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Hash SHA-256 nội dung file (đọc theo khối, không nạp cả file vào bộ nhớ)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# =============================================
+# FILE MANIFEST
+# Mục đích: Ghi nhận file CSV nào đã được nạp vào staging (theo hash nội dung),
+#           để lần chạy sau nạp mọi file còn thiếu và bỏ qua file đã nạp
+# =============================================
+class FileManifest:
+    """
+    Bảng staging_file_manifest (Control DB), mỗi lần nạp 1 file là 1 dòng:
+    file_path, file_size, content_hash, rows_loaded, run_id, status (SUCCESS / FAILED).
+    File được coi là đã nạp khi có dòng SUCCESS cùng content_hash.
+    File lỗi nhiều lần (đếm dòng FAILED) bị cách ly, xóa các dòng FAILED của hash để nạp lại.
+    """
+
+    def __init__(self, db_name=CONTROL_DB):
+        self.db_name = db_name
+        self._table_ready = False
+
+    def _ensure_table(self, cursor):
+        if self._table_ready:
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS staging_file_manifest (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                file_path VARCHAR(1000),
+                file_size BIGINT,
+                content_hash CHAR(64),
+                rows_loaded BIGINT,
+                run_id VARCHAR(64),
+                status VARCHAR(20),
+                error_message TEXT NULL,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_hash_status (content_hash, status)
+            )
+        """)
+        self._table_ready = True
+
+    def loaded_hashes(self, hashes):
+        """Trong các hash truyền vào, trả về tập hash đã nạp thành công."""
+        hashes = list(set(hashes))
+        if not hashes:
+            return set()
+        conn = connect_to_db(self.db_name)
+        if not conn:
+            raise ConnectionError("Không kết nối được Control DB để đọc manifest.")
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            placeholders = ", ".join(["%s"] * len(hashes))
+            cursor.execute(f"""
+                SELECT DISTINCT content_hash FROM staging_file_manifest
+                WHERE status = 'SUCCESS' AND content_hash IN ({placeholders})
+            """, hashes)
+            loaded = {row[0] for row in cursor.fetchall()}
+            cursor.close()
+            return loaded
+        finally:
+            conn.close()
+
+    def failed_attempts(self, hashes):
+        """Trong các hash truyền vào, trả về {hash: số lần nạp FAILED} (chỉ hash đã từng lỗi)."""
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        conn = connect_to_db(self.db_name)
+        if not conn:
+            raise ConnectionError("Không kết nối được Control DB để đọc manifest.")
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            placeholders = ", ".join(["%s"] * len(hashes))
+            cursor.execute(f"""
+                SELECT content_hash, COUNT(*) FROM staging_file_manifest
+                WHERE status = 'FAILED' AND content_hash IN ({placeholders})
+                GROUP BY content_hash
+            """, hashes)
+            attempts = {row[0]: row[1] for row in cursor.fetchall()}
+            cursor.close()
+            return attempts
+        finally:
+            conn.close()
+
+    def record(self, path, size, content_hash, rows_loaded, run_id, status="SUCCESS", error_message=None):
+        conn = connect_to_db(self.db_name)
+        if not conn:
+            print(f"Lỗi: Không thể kết nối DB Control để ghi manifest cho {path}.")
+            return
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            cursor.execute("""
+                INSERT INTO staging_file_manifest
+                (file_path, file_size, content_hash, rows_loaded, run_id, status, error_message)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (os.path.abspath(path), size, content_hash, rows_loaded,
+                  str(run_id) if run_id is not None else None, status, error_message))
+            conn.commit()
+            cursor.close()
+        except mysql.connector.Error as e:
+            print(f"Lỗi khi ghi manifest cho {path}: {e}")
+        finally:
+            conn.close()
@@ -0,0 +1,214 @@
+import os
+import socket
+import threading
+import mysql.connector
+from .db_utils import connect_to_db
+
+# Khóa theo job (job_name + config_id) có thời hạn (lease), gia hạn định kỳ bằng heartbeat
+JOB_LOCKS_ENABLED = os.getenv("JOB_LOCKS_ENABLED", "1") == "1"
+JOB_LOCK_LEASE_SECONDS = int(os.getenv("JOB_LOCK_LEASE_SECONDS", "300"))
+JOB_LOCK_HEARTBEAT_SECONDS = float(os.getenv("JOB_LOCK_HEARTBEAT_SECONDS", "60"))
+
+CONTROL_DB = "news_control_db"
+
+
+def lock_key(job_name, config_id=None):
+    return f"{job_name}|{config_id if config_id is not None else ''}"
+
+
+# =============================================
+# JOB LOCK MANAGER
+# Mục đích: Chặn chạy trùng cùng 1 job (kể cả trước khi có run_id, vd: crawl giữ khóa trong lúc tải);
+#           run bị crash tự hết hạn (lease) và được đánh dấu FAILED để SP_Start_Log không bận mãi
+# Lưu ý: SP_Start_Log vẫn chỉ cho 1 run chưa End trên toàn hệ thống, khóa job KHÔNG giúp
+#        các stage khác nhau chạy song song - chúng vẫn chạy lần lượt như trước
+# =============================================
+class JobLockManager:
+    """
+    Bảng job_locks (Control DB), mỗi job 1 dòng:
+    - acquire(): lấy khóa nếu chưa ai giữ hoặc lease của người giữ đã hết hạn.
+    - Thread heartbeat gia hạn lease cho mọi khóa tiến trình đang giữ.
+    - Khóa được xóa cùng transaction ghi log END (release_runs) hoặc qua release().
+    """
+
+    def __init__(self, lease_seconds=300, heartbeat_seconds=60):
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._held = {}          # lock_key -> run_id
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _ensure_table(self, cursor):
+        if self._table_ready:
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS job_locks (
+                lock_key VARCHAR(255) PRIMARY KEY,
+                job_name VARCHAR(255),
+                config_id INT NULL,
+                run_id VARCHAR(64) NULL,
+                owner VARCHAR(255),
+                acquired_at DATETIME,
+                heartbeat_at DATETIME,
+                lease_expires_at DATETIME,
+                INDEX idx_run_id (run_id)
+            )
+        """)
+        self._table_ready = True
+
+    def acquire(self, job_name, config_id=None):
+        """
+        Lấy khóa của job. Trả về (acquired, info):
+        - acquired=True: info['reaped_run_id'] là run của người giữ cũ đã hết lease (cần ghi FAILED).
+        - acquired=False: info là thông tin người đang giữ khóa (run_id, owner, lease_expires_at).
+        Tiến trình đang giữ khóa chưa gắn run (đã reserve_job) thì lấy lại ngay, không hỏi DB.
+        """
+        key = lock_key(job_name, config_id)
+        # Khóa đã giữ sẵn từ trước (reserve, chưa gắn run) -> dùng luôn
+        with self._lock:
+            if key in self._held and self._held[key] is None:
+                return True, {'reaped_run_id': None}
+
+        conn = connect_to_db(CONTROL_DB)
+        if not conn:
+            return False, {'error': "Không kết nối được Control DB"}
+        try:
+            cursor = conn.cursor(dictionary=True)
+            self._ensure_table(cursor)
+            cursor.execute("""
+                SELECT run_id, owner, lease_expires_at, lease_expires_at < NOW() AS expired
+                FROM job_locks WHERE lock_key = %s FOR UPDATE
+            """, (key,))
+            holder = cursor.fetchone()
+            # Khóa của chính tiến trình này mà run đã kết thúc (log END còn chờ ghi) -> lấy lại được
+            own_ended = holder is not None and holder['owner'] == self.owner and not self._is_held(key)
+            if holder and not holder['expired'] and not own_ended:
+                conn.rollback()
+                return False, holder
+
+            if holder:
+                # Lease hết hạn (tiến trình cũ đã chết) hoặc khóa cũ của chính mình -> chiếm khóa
+                cursor.execute("""
+                    UPDATE job_locks
+                    SET run_id = NULL, owner = %s, acquired_at = NOW(), heartbeat_at = NOW(),
+                        lease_expires_at = NOW() + INTERVAL %s SECOND
+                    WHERE lock_key = %s
+                """, (self.owner, self.lease_seconds, key))
+            else:
+                cursor.execute("""
+                    INSERT INTO job_locks (lock_key, job_name, config_id, owner, acquired_at, heartbeat_at, lease_expires_at)
+                    VALUES (%s, %s, %s, %s, NOW(), NOW(), NOW() + INTERVAL %s SECOND)
+                """, (key, job_name, config_id, self.owner, self.lease_seconds))
+            conn.commit()
+            cursor.close()
+        except mysql.connector.Error as e:
+            # Tiến trình khác vừa chèn khóa cùng lúc (duplicate key / deadlock)
+            conn.rollback()
+            return False, {'error': str(e)}
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._held[key] = None
+        self._ensure_heartbeat()
+        reaped = holder['run_id'] if holder and not own_ended else None
+        return True, {'reaped_run_id': reaped}
+
+    def _is_held(self, key):
+        with self._lock:
+            return key in self._held
+
+    def attach_run(self, job_name, config_id, run_id):
+        """Gắn run_id vào khóa đang giữ (để log END xóa đúng khóa)."""
+        key = lock_key(job_name, config_id)
+        with self._lock:
+            self._held[key] = run_id
+        self._execute("UPDATE job_locks SET run_id = %s WHERE lock_key = %s AND owner = %s",
+                      (str(run_id), key, self.owner))
+
+    def release(self, job_name, config_id=None):
+        key = lock_key(job_name, config_id)
+        with self._lock:
+            self._held.pop(key, None)
+        self._execute("DELETE FROM job_locks WHERE lock_key = %s AND owner = %s", (key, self.owner))
+
+    def untrack_run(self, run_id):
+        """Ngừng heartbeat cho khóa của run (khóa sẽ bị xóa khi log END được ghi)."""
+        with self._lock:
+            for key, held_run in list(self._held.items()):
+                if held_run is not None and str(held_run) == str(run_id):
+                    del self._held[key]
+
+    @staticmethod
+    def release_runs(cursor, run_ids):
+        """Xóa khóa của các run đã kết thúc (gọi trong transaction ghi log END)."""
+        if not run_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(run_ids))
+        try:
+            cursor.execute(f"DELETE FROM job_locks WHERE run_id IN ({placeholders})", [str(r) for r in run_ids])
+        except mysql.connector.Error as e:
+            print(f"Lỗi khi xóa khóa job: {e}")
+
+    def expired_runs(self):
+        """Danh sách (lock_key, run_id) có lease đã hết hạn, xóa luôn các khóa đó."""
+        conn = connect_to_db(CONTROL_DB)
+        if not conn:
+            return []
+        try:
+            cursor = conn.cursor()
+            self._ensure_table(cursor)
+            cursor.execute("SELECT lock_key, run_id FROM job_locks WHERE lease_expires_at < NOW() FOR UPDATE")
+            rows = cursor.fetchall()
+            if rows:
+                placeholders = ", ".join(["%s"] * len(rows))
+                cursor.execute(f"DELETE FROM job_locks WHERE lock_key IN ({placeholders})", [r[0] for r in rows])
+            conn.commit()
+            cursor.close()
+            return rows
+        except mysql.connector.Error as e:
+            conn.rollback()
+            print(f"Lỗi khi dọn khóa hết hạn: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def _execute(self, sql, params):
+        conn = connect_to_db(CONTROL_DB)
+        if not conn:
+            return
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            conn.commit()
+            cursor.close()
+        except mysql.connector.Error as e:
+            print(f"Lỗi khi cập nhật job_locks: {e}")
+        finally:
+            conn.close()
+
+    # --- HEARTBEAT ---
+    def _ensure_heartbeat(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._heartbeat_loop, name="job-lock-heartbeat", daemon=True)
+                self._thread.start()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                keys = list(self._held)
+            if not keys:
+                continue
+            placeholders = ", ".join(["%s"] * len(keys))
+            self._execute(f"""
+                UPDATE job_locks
+                SET heartbeat_at = NOW(), lease_expires_at = NOW() + INTERVAL %s SECOND
+                WHERE owner = %s AND lock_key IN ({placeholders})
+            """, [self.lease_seconds, self.owner] + keys)
+
+
+job_locks = JobLockManager(JOB_LOCK_LEASE_SECONDS, JOB_LOCK_HEARTBEAT_SECONDS) if JOB_LOCKS_ENABLED else None
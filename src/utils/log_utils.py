@@ -1,4 +1,21 @@
+import os
+import json
+import queue
+import atexit
+import threading
 from .db_utils import connect_to_db
+from .job_lock import job_locks, JobLockManager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ghi log END bất đồng bộ theo lô (LOG_ASYNC=0 để ghi đồng bộ như cũ)
+# Chỉ lợi trong phạm vi 1 job: log_start kế tiếp vẫn phải chờ mọi END đang xếp hàng ghi xong
+# (SP_Start_Log từ chối khi còn bất kỳ run nào chưa End), xem log_start
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") == "1"
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "50"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1"))
+# File tạm giữ log END khi không kết nối được Control DB (ghi lại ở lần flush sau)
+LOG_SPOOL_FILE = os.getenv("LOG_SPOOL_FILE", os.path.join(BASE_DIR, "source", "control", "log_spool.jsonl"))
 
 # Các hàm ghi log (Sẽ gọi SPs)
 def execute_sp(conn, procname, args):
@@ -13,69 +30,325 @@ def execute_sp(conn, procname, args):
     return None
 
 
-# --- QUẢN LÝ GHI LOG START ---
-def log_start(job_name: str, config_id: int = None):
+# =============================================
+# RUN LOG WRITER
+# Mục đích: Ghi log END ở thread nền theo lô, không chặn luồng ETL
+# =============================================
+class RunLogWriter:
     """
-    Ghi sự kiện START vào Control DB và trả về run_id.
+    - submit(): đưa sự kiện END vào hàng đợi rồi trả về ngay.
+    - Thread nền gom tối đa `batch_size` sự kiện (hoặc chờ `flush_interval` giây),
+      gọi SP_End_Log cho cả lô trên 1 kết nối và commit 1 lần.
+    - Không kết nối được Control DB: lô được ghi vào file spool, lần flush sau ghi lại trước.
+    - flush(): chờ tới khi mọi sự kiện đã gửi xong (log_start gọi trước khi chạy SP_Start_Log);
+      không còn sự kiện chờ ghi thì trả về ngay.
+    Lợi ích bất đồng bộ: ghi END chạy song song với phần việc còn lại của job sau log_end
+    (ghi CSV, checkpoint, dọn dẹp...), không kéo sang job sau vì log_start của job sau phải flush.
     """
+
+    def __init__(self, spool_path=LOG_SPOOL_FILE, batch_size=50, flush_interval=1.0):
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="run-log-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, event):
+        self._ensure_thread()
+        if isinstance(event, dict):
+            with self._lock:
+                self._pending += 1
+        self._queue.put(event)
+
+    def flush(self, timeout=None):
+        """Chờ ghi xong các sự kiện đã submit. Trả về False nếu quá timeout."""
+        with self._lock:
+            idle = self._pending == 0
+        if idle and not os.path.exists(self.spool_path):
+            return True
+        done = threading.Event()
+        self.submit(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=30):
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(timeout)
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # 1: Gom lô sự kiện đang chờ (kèm các yêu cầu flush)
+            items = [first]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = [item for item in items if isinstance(item, dict)]
+            markers = [item for item in items if isinstance(item, threading.Event)]
+            stop = any(item is None for item in items)
+
+            # 2: Ghi lô xuống DB (hoặc spool); lỗi bất ngờ không được làm chết thread
+            try:
+                self.write_batch(events, replay_spool=bool(events or markers))
+            except Exception as e:
+                print(f"Lỗi khi ghi Log END theo lô: {e}")
+            with self._lock:
+                self._pending -= len(events)
+            for marker in markers:
+                marker.set()
+
+    def _read_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        events = []
+        with open(self.spool_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    events.append(json.loads(line))
+        os.remove(self.spool_path)
+        if events:
+            print(f"[LOG] Ghi lại {len(events)} log END từ file spool {self.spool_path}")
+        return events
+
+    def _spool(self, events):
+        os.makedirs(os.path.dirname(self.spool_path), exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Lỗi: Không thể kết nối DB Control, đã lưu {len(events)} log END vào {self.spool_path}")
+
+    def write_batch(self, events, replay_spool=True):
+        """Gọi SP_End_Log cho cả lô và commit 1 lần."""
+        if replay_spool:
+            events = self._read_spool() + events
+        if not events:
+            return
+
+        conn_control = connect_to_db("news_control_db")
+        if not conn_control:
+            self._spool(events)
+            return
+
+        try:
+            cursor = conn_control.cursor()
+            for i, event in enumerate(events):
+                try:
+                    cursor.callproc('SP_End_Log', [
+                        event['run_id'],
+                        event['status'],
+                        event['records_extracted'],
+                        event['records_loaded'],
+                        event['error_message']
+                    ])
+                except Exception as e:
+                    if not conn_control.is_connected():
+                        # Mất kết nối giữa chừng -> giữ phần chưa ghi lại cho lần sau
+                        self._spool(events[i:])
+                        events = events[:i]
+                        break
+                    print(f"Lỗi khi ghi Log END (RUN_ID: {event['run_id']}): {e}")
+            # Run đã kết thúc -> xóa khóa job trong cùng transaction
+            if job_locks is not None:
+                JobLockManager.release_runs(cursor, [event['run_id'] for event in events])
+            conn_control.commit()
+            cursor.close()
+            for event in events:
+                print(f"Ghi Log END thành công. RUN_ID: {event['run_id']}, Status: {event['status']}")
+        finally:
+            conn_control.close()
+
+
+_log_writer = RunLogWriter(LOG_SPOOL_FILE, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL)
+atexit.register(_log_writer.close)
+
+def flush_logs(timeout=None):
+    """Chờ các log END đang xếp hàng được ghi xong."""
+    return _log_writer.flush(timeout)
+
+
+# --- QUẢN LÝ GHI LOG START ---
+def _call_start_log(job_name, config_id):
+    """Gọi SP_Start_Log. Trả về (run_id, conn, busy)."""
+    flush_logs()
+
     conn_control = connect_to_db("news_control_db")
     if not conn_control:
         print("Lỗi: Không thể kết nối DB Control để ghi Log START.")
-        return None, None
-    
+        return None, None, False
+
     try:
         # 1. Chuẩn bị tham số (config_id, job_name, OUT variable name)
-        args = [config_id, job_name, None] 
-        
+        args = [config_id, job_name, None]
+
         # 2. Thực thi SP: execute_sp sẽ tự động commit và trả về run_id
         run_id = execute_sp(conn_control, 'SP_Start_Log', args)
-        
-        if run_id:
-            print(f"[LOG] Bắt đầu Job: {job_name} | Run ID: {run_id}")
-            # Trả về run_id và conn (theo đúng format code cũ của bạn)
-            return run_id, conn_control
-        else:
-            # NẾU SQL TRẢ VỀ NULL -> CÓ NGHĨA LÀ ĐANG BẬN
-            print(f"HỆ THỐNG ĐANG BẬN: Có Job khác đang chạy (Start mà chưa End).")
-            print("   -> Vui lòng chờ job cũ chạy xong.")
-            return None, None
+
+        # NẾU SQL TRẢ VỀ NULL -> CÓ NGHĨA LÀ ĐANG BẬN
+        return run_id, conn_control, not run_id
 
     except Exception as e:
         print(f"Lỗi khi ghi Log START: {e}")
-        
+
     finally:
         if conn_control: conn_control.close()
-        
-    return None, None # Trả về None nếu có lỗi
+
+    return None, None, False # Trả về None nếu có lỗi
+
+def _reap_expired_runs():
+    """Ghi FAILED cho các run có khóa đã hết lease (tiến trình chạy job đã chết). Trả về số run."""
+    reaped = 0
+    for key, run_id in job_locks.expired_runs():
+        if run_id:
+            print(f"[LOG] Run {run_id} ({key}) đã hết lease -> ghi FAILED.")
+            log_end(run_id, "FAILED", 0, 0, "Lease expired: tiến trình chạy job đã dừng bất thường")
+            reaped += 1
+    return reaped
+
+def reserve_job(job_name: str, config_id: int = None):
+    """
+    Lấy khóa của job trước khi bắt đầu làm việc (vd: crawl lấy khóa trước khi đưa URL vào hàng đợi),
+    log_start của job sau đó dùng lại khóa này. Trả về False nếu job đang chạy ở nơi khác.
+    Khóa bị tắt (JOB_LOCKS_ENABLED=0) thì luôn trả về True.
+    """
+    if job_locks is None:
+        return True
+
+    # 0. Ghi hết log END đang chờ trước khi lấy khóa: log END của run trước cùng job
+    #    là thứ xóa khóa (release_runs), chưa ghi thì job sẽ thấy khóa của chính mình
+    flush_logs()
+
+    # 0.1. Khóa theo job, run cũ hết lease được ghi FAILED
+    acquired, info = job_locks.acquire(job_name, config_id)
+    if not acquired:
+        if 'error' in info:
+            print(f"Lỗi khi lấy khóa job {job_name}: {info['error']}")
+        else:
+            print(f"JOB ĐANG CHẠY: {job_name} đang được chạy bởi {info['owner']} "
+                  f"(Run ID: {info['run_id']}, lease tới {info['lease_expires_at']}).")
+        return False
+    if info['reaped_run_id']:
+        print(f"[LOG] Run {info['reaped_run_id']} của {job_name} đã hết lease -> ghi FAILED.")
+        log_end(info['reaped_run_id'], "FAILED", 0, 0, "Lease expired: tiến trình chạy job đã dừng bất thường")
+    return True
+
+def release_job(job_name: str, config_id: int = None):
+    """Trả khóa đã reserve_job mà không chạy job (không có run nào được ghi)."""
+    if job_locks is not None:
+        job_locks.release(job_name, config_id)
+
+def log_start(job_name: str, config_id: int = None):
+    """
+    Ghi sự kiện START vào Control DB và trả về run_id.
+    - Lấy khóa của job (job_name + config_id) trước: job đang chạy ở nơi khác thì trả về None.
+    - Khóa job chỉ chống chạy trùng và dọn run chết (lease); SP_Start_Log vẫn trả về NULL khi
+      còn bất kỳ run nào (của job khác, stage khác) chưa End -> các job vẫn chạy tuần tự.
+    - Mọi log END còn trong hàng đợi (của mọi job, không chỉ job này) được ghi trước:
+      SP_Start_Log trả về NULL khi còn bất kỳ run nào chưa End, nên không thể chỉ flush END
+      cùng khóa job. Vì vậy LOG_ASYNC chỉ giúp trong phạm vi 1 job (xem RunLogWriter);
+      giữa 2 job liên tiếp, log_start chờ như ghi đồng bộ.
+    """
+    # 0. Khóa theo job (dùng lại khóa đã reserve_job nếu có)
+    if not reserve_job(job_name, config_id):
+        return None, None
+
+    run_id, conn_control, busy = _call_start_log(job_name, config_id)
+
+    # 0.2. SP báo bận (còn run chưa End ở bất kỳ job nào) -> dọn các run đã hết lease
+    #      (tiến trình đã chết, không bao giờ tự End) rồi thử lại 1 lần
+    if busy and job_locks is not None and _reap_expired_runs():
+        run_id, conn_control, busy = _call_start_log(job_name, config_id)
+
+    if run_id:
+        if job_locks is not None:
+            job_locks.attach_run(job_name, config_id, run_id)
+        print(f"[LOG] Bắt đầu Job: {job_name} | Run ID: {run_id}")
+        # Trả về run_id và conn (theo đúng format code cũ của bạn)
+        return run_id, conn_control
+
+    if job_locks is not None:
+        job_locks.release(job_name, config_id)
+    if busy:
+        print(f"HỆ THỐNG ĐANG BẬN: Có Job khác đang chạy (Start mà chưa End).")
+        print("   -> Vui lòng chờ job cũ chạy xong.")
+    return None, None
 
 # --- QUẢN LÝ GHI LOG END/FAIL ---
 def log_end(run_id: str, status: str, records_extracted: int, records_loaded: int, error_message: str = None):
     """
     Ghi sự kiện END (SUCCESS/FAIL) vào Control DB.
-    Sử dụng SP_End_Log.
+    Sử dụng SP_End_Log; mặc định xếp hàng cho thread nền ghi theo lô (LOG_ASYNC).
     """
+    event = {
+        'run_id': run_id,
+        'status': status,
+        'records_extracted': records_extracted,
+        'records_loaded': records_loaded,
+        'error_message': error_message
+    }
+    if job_locks is not None:
+        job_locks.untrack_run(run_id)
+    if LOG_ASYNC:
+        _log_writer.submit(event)
+    else:
+        _log_writer.write_batch([event])
+
+
+# --- GHI TIẾN ĐỘ JOB ---
+_progress_table_ready = False
+
+def log_progress(run_id: str, job_name: str, rows_done: int, message: str = None):
+    """
+    Ghi tiến độ của run đang chạy vào bảng etl_run_progress (Control DB).
+    Gọi ghi đè theo run_id: bảng chỉ giữ tiến độ mới nhất của mỗi run. Lỗi ghi không làm hỏng job.
+    """
+    global _progress_table_ready
+    print(f"[PROGRESS] {job_name} | Run ID: {run_id} | {rows_done} dòng" + (f" | {message}" if message else ""))
+    if run_id is None:
+        return
     conn_control = connect_to_db("news_control_db")
     if not conn_control:
-        print("Lỗi: Không thể kết nối DB Control để ghi Log END/FAIL.")
         return
-        
     try:
-        # 1. Chuẩn bị tham số đầu vào (không có tham số OUT)
-        args = [
-            run_id, 
-            status, 
-            records_extracted, 
-            records_loaded, 
-            error_message
-        ]
-        
-        # 2. Thực thi SP:
-        execute_sp(conn_control, 'SP_End_Log', args)
-        
-        print(f"Ghi Log END thành công. RUN_ID: {run_id}, Status: {status}")
-
+        cursor = conn_control.cursor()
+        if not _progress_table_ready:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS etl_run_progress (
+                    run_id VARCHAR(64) PRIMARY KEY,
+                    job_name VARCHAR(255),
+                    rows_done BIGINT,
+                    message VARCHAR(1000),
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+                )
+            """)
+            _progress_table_ready = True
+        cursor.execute("""
+            INSERT INTO etl_run_progress (run_id, job_name, rows_done, message)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE rows_done = VALUES(rows_done), message = VALUES(message)
+        """, (str(run_id), job_name, rows_done, message))
+        conn_control.commit()
+        cursor.close()
     except Exception as e:
-        print(f"Lỗi khi ghi Log END: {e}")
-        
+        print(f"Lỗi khi ghi tiến độ (RUN_ID: {run_id}): {e}")
     finally:
-        if conn_control: conn_control.close()
\ No newline at end of file
+        conn_control.close()
@@ -0,0 +1,156 @@
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import psutil
+from .db_utils import connect_to_db
+
+
+# =============================================
+# PEAK RSS SAMPLER
+# Mục đích: Đo RSS lớn nhất của tiến trình hiện tại + tiến trình con (Chrome, parser, ...)
+# =============================================
+class PeakRssSampler:
+    def __init__(self, interval=0.2, include_children=True):
+        self.interval = interval
+        self.include_children = include_children
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        if self.include_children:
+            for child in proc.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    continue
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class StageMetrics:
+    """Số liệu của 1 bước con. Job tự gán rows / bytes_read / bytes_written trong khối `with`."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.status = "SUCCESS"
+        self.started_at = datetime.now()
+        self.wall_seconds = 0.0
+        self.peak_rss_bytes = 0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.wall_seconds if self.wall_seconds else 0.0
+
+
+# =============================================
+# RUN METRICS
+# Mục đích: Đo thời gian, tốc độ, I/O và bộ nhớ từng bước con của 1 lần chạy job,
+#           lưu vào bảng etl_run_metrics trong Control DB
+# =============================================
+class RunMetrics:
+    """
+    metrics = RunMetrics(run_id, job_name)
+    with metrics.stage("read_csv") as st:
+        ...
+        st.rows = so_dong
+        st.bytes_read = so_byte
+    metrics.save()
+    """
+
+    _table_ready = False
+
+    def __init__(self, run_id, job_name):
+        self.run_id = run_id
+        self.job_name = job_name
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        st = StageMetrics(name)
+        sampler = PeakRssSampler(interval=0.1).start()
+        start = time.perf_counter()
+        try:
+            yield st
+        except BaseException:
+            st.status = "FAILED"
+            raise
+        finally:
+            st.wall_seconds = time.perf_counter() - start
+            sampler.stop()
+            st.peak_rss_bytes = sampler.peak_bytes
+            self.stages.append(st)
+            print(f"[METRICS] {self.job_name} / {st.name}: {st.wall_seconds:.2f}s | {st.rows} dòng "
+                  f"({st.rows_per_sec:.1f} dòng/giây) | RSS cao nhất {st.peak_rss_bytes / 1024 / 1024:.0f} MB")
+
+    @classmethod
+    def _ensure_table(cls, cursor):
+        if cls._table_ready:
+            return
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS etl_run_metrics (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                run_id VARCHAR(64),
+                job_name VARCHAR(255),
+                stage VARCHAR(255),
+                status VARCHAR(20),
+                started_at DATETIME,
+                wall_seconds DOUBLE,
+                rows_processed BIGINT,
+                rows_per_sec DOUBLE,
+                bytes_read BIGINT,
+                bytes_written BIGINT,
+                peak_rss_mb DOUBLE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_run_id (run_id)
+            )
+        """)
+        cls._table_ready = True
+
+    def save(self):
+        """Ghi toàn bộ bước con vào etl_run_metrics. Lỗi ghi metrics không làm hỏng job."""
+        if not self.stages or self.run_id is None:
+            return
+        conn_control = connect_to_db("news_control_db")
+        if not conn_control:
+            print("Lỗi: Không thể kết nối DB Control để ghi metrics.")
+            return
+        try:
+            cursor = conn_control.cursor()
+            self._ensure_table(cursor)
+            cursor.executemany("""
+                INSERT INTO etl_run_metrics
+                (run_id, job_name, stage, status, started_at, wall_seconds, rows_processed,
+                 rows_per_sec, bytes_read, bytes_written, peak_rss_mb)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            """, [(
+                str(self.run_id), self.job_name, st.name, st.status, st.started_at,
+                st.wall_seconds, int(st.rows), st.rows_per_sec,
+                int(st.bytes_read), int(st.bytes_written), st.peak_rss_bytes / 1024 / 1024
+            ) for st in self.stages])
+            conn_control.commit()
+            cursor.close()
+            self.stages = []
+        except Exception as e:
+            print(f"Lỗi khi ghi metrics: {e}")
+        finally:
+            conn_control.close()
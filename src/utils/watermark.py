@@ -0,0 +1,63 @@
+import mysql.connector
+from .db_utils import connect_to_db
+
+CONTROL_DB = "news_control_db"
+
+_table_ready = False
+
+
+# =============================================
+# WATERMARK
+# Mục đích: Lưu mốc đã xử lý của từng job (vd: run_id staging lớn nhất đã transform)
+#           để lần chạy sau chỉ xử lý phần dữ liệu mới
+# =============================================
+def _ensure_table(cursor):
+    global _table_ready
+    if _table_ready:
+        return
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermark (
+            job_name VARCHAR(255) PRIMARY KEY,
+            watermark_value BIGINT,
+            run_id VARCHAR(64) NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    _table_ready = True
+
+def get_watermark(job_name):
+    """Mốc đã xử lý của job, None nếu chưa có (xử lý toàn bộ)."""
+    conn = connect_to_db(CONTROL_DB)
+    if not conn:
+        raise ConnectionError("Không kết nối được Control DB để đọc watermark.")
+    try:
+        cursor = conn.cursor()
+        _ensure_table(cursor)
+        cursor.execute("SELECT watermark_value FROM etl_watermark WHERE job_name = %s", (job_name,))
+        row = cursor.fetchone()
+        cursor.close()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+def set_watermark(job_name, value, run_id=None):
+    """Ghi mốc mới sau khi job xử lý xong. Trả về True nếu ghi thành công."""
+    conn = connect_to_db(CONTROL_DB)
+    if not conn:
+        print(f"Lỗi: Không thể kết nối DB Control để ghi watermark của {job_name}.")
+        return False
+    try:
+        cursor = conn.cursor()
+        _ensure_table(cursor)
+        cursor.execute("""
+            INSERT INTO etl_watermark (job_name, watermark_value, run_id) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE watermark_value = VALUES(watermark_value), run_id = VALUES(run_id)
+        """, (job_name, value, str(run_id) if run_id is not None else None))
+        conn.commit()
+        cursor.close()
+        return True
+    except mysql.connector.Error as e:
+        print(f"Lỗi khi ghi watermark của {job_name}: {e}")
+        return False
+    finally:
+        conn.close()
@@ -0,0 +1,80 @@
+import os
+import csv
+import sys
+import glob
+import gzip
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from extract.checkpoint import CrawlCheckpoint
+from extract.csv_writer import StreamingCsvWriter
+
+JOBS = [
+    {"config_id": 1, "start_url": "https://example.com/a", "urls": [f"https://example.com/a/{n}" for n in range(3)]},
+    {"config_id": 2, "start_url": "https://example.com/b", "urls": [f"https://example.com/b/{n}" for n in range(3)]},
+    {"config_id": 3, "start_url": "https://example.com/c", "urls": [f"https://example.com/c/{n}" for n in range(3)]},
+]
+
+
+def crawl(output_dir, checkpoint_dir, resume, crash_after_jobs=None):
+    """Vòng crawl thu nhỏ giống web_scraper: ghi CSV theo job, flush rồi ghi checkpoint job_done."""
+    checkpoint = CrawlCheckpoint.latest_unfinished(checkpoint_dir) if resume else None
+    writer = StreamingCsvWriter(output_dir=output_dir, flush_rows=1000, compress=True,
+                                prefix=checkpoint.csv_prefix if checkpoint else None)
+    if not checkpoint:
+        checkpoint = CrawlCheckpoint("run-1", writer.prefix, checkpoint_dir)
+    writer.on_flush = checkpoint.mark_rows
+
+    crawled = []
+    for n, job in enumerate(JOBS):
+        if checkpoint.is_job_done(job):
+            continue
+        rows = [{"article_url": url} for url in job["urls"] if not checkpoint.is_url_processed(url)]
+        crawled.extend(r["article_url"] for r in rows)
+        writer.write_rows(rows)
+        if crash_after_jobs is not None and n == crash_after_jobs:
+            # Crawler chết: buffer chưa flush của job này mất, không close()/mark_finished()
+            checkpoint.close()
+            return crawled
+        writer.flush()
+        checkpoint.mark_job_done(job)
+
+    writer.close()
+    checkpoint.mark_finished()
+    checkpoint.close()
+    return crawled
+
+
+class CrawlResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.checkpoint_dir = os.path.join(self.dir, "checkpoint")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def saved_urls(self):
+        urls = []
+        for path in sorted(glob.glob(os.path.join(self.dir, "article_*.csv.gz"))):
+            with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+                urls.extend(r["article_url"] for r in csv.DictReader(f))
+        return urls
+
+    def test_resume_skips_jobs_flushed_before_crash(self):
+        # Lượt đầu chết giữa job thứ 2 (dữ liệu nhỏ hơn rất nhiều so với max_bytes)
+        first = crawl(self.dir, self.checkpoint_dir, resume=False, crash_after_jobs=1)
+        self.assertEqual(len(first), 6)
+        self.assertEqual(self.saved_urls(), JOBS[0]["urls"])
+
+        # --resume: job 1 đã xong -> bỏ qua, chỉ crawl lại job 2 và job 3
+        second = crawl(self.dir, self.checkpoint_dir, resume=True)
+        self.assertEqual(second, JOBS[1]["urls"] + JOBS[2]["urls"])
+        self.assertEqual(sorted(self.saved_urls()), sorted(u for job in JOBS for u in job["urls"]))
+        self.assertIsNone(CrawlCheckpoint.latest_unfinished(self.checkpoint_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import csv
+import sys
+import gzip
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from extract.csv_writer import StreamingCsvWriter
+
+
+def row(n):
+    return {"article_url": f"https://example.com/{n}", "title_raw": f"bài {n}"}
+
+
+class StreamingCsvWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.committed = []
+        self.writer = StreamingCsvWriter(
+            output_dir=self.dir, flush_rows=1, compress=True, prefix="article_test",
+            on_flush=lambda rows: self.committed.extend(r["article_url"] for r in rows)
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, path):
+        with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as f:
+            return [r["article_url"] for r in csv.DictReader(f)]
+
+    def test_flushed_rows_are_readable_and_checkpointed_before_close(self):
+        self.writer.write_rows([row(1)])
+        self.writer.write_rows([row(2)])
+        # Chưa close(): part mang tên thật, đọc được hết (mỗi lần flush là 1 gzip member hoàn chỉnh)
+        self.assertEqual(os.listdir(self.dir), ["article_test_part001.csv.gz"])
+        self.assertEqual(self.read(self.writer.parts[0]), ["https://example.com/1", "https://example.com/2"])
+        self.assertEqual(self.committed, ["https://example.com/1", "https://example.com/2"])
+
+        self.writer.close()
+        self.assertEqual(self.read(self.writer.parts[0]), ["https://example.com/1", "https://example.com/2"])
+
+    def test_rotates_part_by_size(self):
+        self.writer.max_bytes = 1
+        self.writer.write_rows([row(1), row(2)])
+        self.writer.write_rows([row(3)])
+        parts = self.writer.close()
+        self.assertEqual([os.path.basename(p) for p in parts],
+                         ["article_test_part001.csv.gz", "article_test_part002.csv.gz"])
+        self.assertEqual(self.read(parts[1]), ["https://example.com/3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+try:
+    from extract.html_parser import extract_fields_bs4, extract_fields_lxml
+except ImportError:
+    extract_fields_bs4 = None
+
+# Selector giống cấu hình VnExpress trong web_scraper.SELECTOR_LOOKUP
+SOURCE_CFG = {
+    'selectors': {
+        'tieu_de': 'h1.title-detail',
+        'summary': 'p.description',
+        'content_raw': 'article.fck_detail p.Normal',
+        'ngay_xuat_ban': 'span.date',
+        'ten_tac_gia': 'p.Normal strong',
+        'tags': 'div.tags h4.item-tag a',
+    },
+}
+
+# Trang có tác giả / ngày đăng nằm cả trong lẫn ngoài khung bài viết
+PAGE = """
+<html><body>
+<section class="page-detail">
+  <h1 class="title-detail">Tiêu đề</h1>
+  <span class="date">Thu 2</span>
+  <p class="description">Mô tả</p>
+  <article class="fck_detail"><p class="Normal">Nội dung</p></article>
+  <p class="Normal"><strong>B</strong></p>
+</section>
+<aside><span class="date">sidebar date</span><p class="Normal"><strong>X</strong></p></aside>
+</body></html>
+"""
+
+
+@unittest.skipIf(extract_fields_bs4 is None, "thiếu bs4 / lxml")
+class HtmlParserTest(unittest.TestCase):
+    def test_lxml_matches_bs4_across_whole_page(self):
+        expected = extract_fields_bs4(PAGE, SOURCE_CFG)
+        actual = extract_fields_lxml(PAGE, "VnExpress-test", SOURCE_CFG)
+        self.assertEqual(actual, expected)
+        self.assertEqual(actual['author_raw'], "B\nX")
+        self.assertEqual(actual['published_at_raw'], "Thu 2\nsidebar date")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import types
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# pipeline chỉ cần parse_page từ html_parser; môi trường thiếu bs4/lxml thì thay bằng module rỗng
+try:
+    import extract.html_parser  # noqa: F401
+except ImportError:
+    stub = types.ModuleType("extract.html_parser")
+    stub.parse_page = lambda *args: None
+    sys.modules["extract.html_parser"] = stub
+
+from extract import pipeline
+from extract.rate_limiter import AdaptiveRateLimiter
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class FakeFetcher:
+    """StaticFetcher giả: mọi URL trả về HTML tĩnh thiếu nội dung bài."""
+
+    def submit(self, url, report):
+        report(200, 0.0)
+        return _done("static-html")
+
+
+class FakeDriverPool:
+    """DriverPool giả: gọi fn(driver, *args) ngay trên thread hiện tại."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def submit(self, fn, *args):
+        self.calls += 1
+        return _done(fn(None, *args))
+
+
+def fake_parse_page(html, source_name, job, keys, backend):
+    # Trang tĩnh không qua được kiểm tra selector -> None (giống parse_page thật)
+    return None if html == "static-html" else {"title_raw": "ok"}
+
+
+class CrawlPipelineFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self._parse_page = pipeline.parse_page
+        pipeline.parse_page = fake_parse_page
+
+    def tearDown(self):
+        pipeline.parse_page = self._parse_page
+
+    def test_static_page_failing_selector_check_falls_back_to_selenium(self):
+        driver_pool = FakeDriverPool()
+        crawl = pipeline.CrawlPipeline(
+            driver_pool, lambda driver, url, job: "selenium-html", fetcher=FakeFetcher(),
+            limiter=AdaptiveRateLimiter(initial_rate=1000, max_rate=1000, burst=100), parse_workers=1)
+        crawl.executor.shutdown()
+        crawl.executor = ThreadPoolExecutor(max_workers=1)
+        job = {"domain": "example.com", "fetch_mode": "static", "source_name_raw": "Example",
+               "wait": {"article": ["content"]}}
+        results = []
+        try:
+            crawl.run([("job", job, "https://example.com/a")], lambda key, url, fields: results.append(fields))
+        finally:
+            crawl.close()
+
+        self.assertEqual(results, [{"title_raw": "ok"}])
+        self.assertEqual(crawl.fallback_count, 1)
+        self.assertEqual(driver_pool.calls, 1)
+        self.assertEqual(crawl.parsed_pages, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()